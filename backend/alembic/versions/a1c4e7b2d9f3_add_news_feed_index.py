@@ -0,0 +1,39 @@
+"""add_news_feed_index
+
+Revision ID: a1c4e7b2d9f3
+Revises: f48710c108ae
+Create Date: 2026-10-18 10:12:04.381927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c4e7b2d9f3'
+down_revision: Union[str, Sequence[str], None] = 'f48710c108ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индекс под keyset-пагинацию ленты: ORDER BY publication_date DESC, id DESC.
+    # CONCURRENTLY, чтобы не блокировать запись в news на время построения
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_news_publication_date_id',
+            'news',
+            ['publication_date', 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_news_publication_date_id',
+            table_name='news',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,26 @@
+"""add_news_views
+
+Revision ID: a6c2e9f4d3b8
+Revises: f2b7d4e8a6c1
+Create Date: 2026-10-18 19:02:18.305744
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e9f4d3b8'
+down_revision: Union[str, Sequence[str], None] = 'f2b7d4e8a6c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('news', sa.Column('views', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('news', 'views')
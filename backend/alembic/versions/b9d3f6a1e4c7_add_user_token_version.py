@@ -0,0 +1,26 @@
+"""add_user_token_version
+
+Revision ID: b9d3f6a1e4c7
+Revises: a6c2e9f4d3b8
+Create Date: 2026-10-18 20:11:36.947152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d3f6a1e4c7'
+down_revision: Union[str, Sequence[str], None] = 'a6c2e9f4d3b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,50 @@
+"""add_news_search_vector
+
+Revision ID: c3e8a5d17f42
+Revises: b7d2f91c3e5a
+Create Date: 2026-10-18 15:21:48.093517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a5d17f42'
+down_revision: Union[str, Sequence[str], None] = 'b7d2f91c3e5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Заголовок весит больше текста; из content берутся только строковые значения JSON.
+    # STORED-колонка перезаписывает таблицу под эксклюзивной блокировкой
+    op.execute(
+        """
+        ALTER TABLE news ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+            setweight(jsonb_to_tsvector('russian', coalesce(content::jsonb, '{}'::jsonb), '["string"]'), 'B')
+        ) STORED
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_news_search_vector',
+            'news',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_news_search_vector',
+            table_name='news',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('news', 'search_vector')
@@ -0,0 +1,26 @@
+"""add_news_views_flush_id
+
+Revision ID: d7e2b5f9a3c1
+Revises: c4f1a8e3b7d2
+Create Date: 2026-10-18 23:41:07.512834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e2b5f9a3c1'
+down_revision: Union[str, Sequence[str], None] = 'c4f1a8e3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('news', sa.Column('views_flush_id', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('news', 'views_flush_id')
@@ -0,0 +1,154 @@
+"""news_content_jsonb
+
+Revision ID: d8f4b6a2c1e9
+Revises: c3e8a5d17f42
+Create Date: 2026-10-18 16:40:12.774301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f4b6a2c1e9'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a5d17f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+    setweight(jsonb_to_tsvector('russian', coalesce({content}, '{{}}'::jsonb), '["string"]'), 'B')
+"""
+
+
+def upgrade() -> None:
+    # ALTER TABLE ... TYPE jsonb переписал бы таблицу под эксклюзивной блокировкой,
+    # поэтому данные переносятся в новые колонки пачками, а меняются колонки местами
+    # одной короткой транзакцией в конце.
+    #
+    # 1. Новые колонки; пока идёт перенос, триггер заполняет их при любой записи.
+    #    search_vector заодно перестаёт быть генерируемой колонкой: генерируемую
+    #    пришлось бы пересоздавать с перезаписью таблицы
+    op.add_column('news', sa.Column('content_jsonb', sa.dialects.postgresql.JSONB(), nullable=True))
+    op.add_column('news', sa.Column('search_vector_new', sa.dialects.postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        """
+        ALTER TABLE news ADD CONSTRAINT news_content_jsonb_not_null
+        CHECK (content_jsonb IS NOT NULL) NOT VALID
+        """
+    )
+    op.execute(
+        f"""
+        CREATE FUNCTION news_sync_content_jsonb() RETURNS trigger AS $$
+        BEGIN
+            NEW.content_jsonb := NEW.content::jsonb;
+            NEW.search_vector_new := {SEARCH_VECTOR_SQL.format(content="NEW.content::jsonb")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER news_sync_content_jsonb BEFORE INSERT OR UPDATE ON news
+        FOR EACH ROW EXECUTE FUNCTION news_sync_content_jsonb()
+        """
+    )
+
+    # 2. Перенос пачками по id, каждая пачка — отдельная транзакция.
+    #    Обе новые колонки заполняет сработавший на UPDATE триггер
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        min_id, max_id = bind.execute(sa.text("SELECT min(id), max(id) FROM news")).one()
+        if min_id is not None:
+            for start in range(min_id, max_id + 1, BATCH_SIZE):
+                bind.execute(
+                    sa.text(
+                        "UPDATE news SET content_jsonb = content::jsonb "
+                        "WHERE id >= :start AND id < :end AND content_jsonb IS NULL"
+                    ),
+                    {"start": start, "end": start + BATCH_SIZE},
+                )
+        # Проверка ограничения не блокирует запись и позволит выставить NOT NULL без сканирования
+        bind.execute(sa.text("ALTER TABLE news VALIDATE CONSTRAINT news_content_jsonb_not_null"))
+
+    # 3. Подмена колонок: только изменения каталога, без перезаписи данных
+    op.execute("DROP TRIGGER news_sync_content_jsonb ON news")
+    op.execute("DROP FUNCTION news_sync_content_jsonb()")
+    op.drop_column('news', 'search_vector')
+    op.drop_column('news', 'content')
+    op.alter_column('news', 'content_jsonb', new_column_name='content', nullable=False)
+    op.drop_constraint('news_content_jsonb_not_null', 'news', type_='check')
+    op.alter_column('news', 'search_vector_new', new_column_name='search_vector')
+    op.execute(
+        f"""
+        CREATE FUNCTION news_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_SQL.format(content="NEW.content")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER news_search_vector_update BEFORE INSERT OR UPDATE OF title, content ON news
+        FOR EACH ROW EXECUTE FUNCTION news_search_vector_update()
+        """
+    )
+
+    # 4. Индексы: полнотекстовый (удалён вместе со старой колонкой) и по содержимому
+    #    для фильтров content @> '{"blocks": [{"type": ...}]}' / '{"tags": [...]}'
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_news_search_vector',
+            'news',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_news_content',
+            'news',
+            ['content'],
+            postgresql_using='gin',
+            postgresql_ops={'content': 'jsonb_path_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_news_content', table_name='news', postgresql_concurrently=True)
+        op.drop_index('ix_news_search_vector', table_name='news', postgresql_concurrently=True)
+
+    op.execute("DROP TRIGGER news_search_vector_update ON news")
+    op.execute("DROP FUNCTION news_search_vector_update()")
+    op.drop_column('news', 'search_vector')
+    op.alter_column(
+        'news',
+        'content',
+        type_=sa.JSON(),
+        postgresql_using='content::json',
+    )
+    op.execute(
+        """
+        ALTER TABLE news ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+            setweight(jsonb_to_tsvector('russian', coalesce(content::jsonb, '{}'::jsonb), '["string"]'), 'B')
+        ) STORED
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_news_search_vector',
+            'news',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,38 @@
+"""add_comments_news_index
+
+Revision ID: e5a9c3f7b2d4
+Revises: d8f4b6a2c1e9
+Create Date: 2026-10-18 17:32:55.208913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c3f7b2d4'
+down_revision: Union[str, Sequence[str], None] = 'd8f4b6a2c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Комментарии новости по порядку: WHERE news_id = ? ORDER BY publication_date, id
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_comments_news_id_publication_date_id',
+            'comments',
+            ['news_id', 'publication_date', 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_comments_news_id_publication_date_id',
+            table_name='comments',
+            postgresql_concurrently=True,
+        )
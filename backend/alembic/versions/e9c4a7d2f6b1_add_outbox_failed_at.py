@@ -0,0 +1,26 @@
+"""add_outbox_failed_at
+
+Revision ID: e9c4a7d2f6b1
+Revises: d7e2b5f9a3c1
+Create Date: 2026-10-18 23:58:42.907316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c4a7d2f6b1'
+down_revision: Union[str, Sequence[str], None] = 'd7e2b5f9a3c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox_events', sa.Column('failed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('outbox_events', 'failed_at')
@@ -0,0 +1,30 @@
+"""add_news_comment_stats
+
+Revision ID: f2b7d4e8a6c1
+Revises: e5a9c3f7b2d4
+Create Date: 2026-10-18 18:15:40.662081
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d4e8a6c1'
+down_revision: Union[str, Sequence[str], None] = 'e5a9c3f7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Константный default не переписывает таблицу. Значения для существующих
+    # новостей заполняет задача app.tasks.backfill_comment_stats
+    op.add_column('news', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('news', sa.Column('last_comment_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('news', 'last_comment_at')
+    op.drop_column('news', 'comment_count')
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.hash import argon2
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Модуль импортируется и в дочерних процессах пула, поэтому тянет только настройки
+hasher = argon2.using(
+    time_cost=settings.argon2_time_cost,
+    memory_cost=settings.argon2_memory_cost,
+    parallelism=settings.argon2_parallelism,
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+# Сколько хэширований ждут или выполняются в пуле (меняется только из event loop)
+_pending = 0
+
+
+def _hash(password: str) -> str:
+    return hasher.hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return hasher.verify(password, hashed)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: процесс воркера к этому моменту уже с потоками
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+# Процесс пула, убитый посреди хэширования (например, по OOM), ломает весь
+# ProcessPoolExecutor. Сломанный пул отбрасываем — следующий вызов создаст новый
+def _drop_executor(executor: ProcessPoolExecutor):
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def run_in_hash_pool(func, *args):
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        logger.warning(f"Password hashing pool saturated ({_pending} pending)")
+        raise _busy()
+    executor = get_executor()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        logger.error("Password hashing pool is broken, recreating it")
+        _drop_executor(executor)
+        raise _busy()
+    finally:
+        _pending -= 1
+
+
+async def get_password_hash(password: str) -> str:
+    return await run_in_hash_pool(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await run_in_hash_pool(_verify, password, hashed)
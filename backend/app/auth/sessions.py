@@ -0,0 +1,249 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import logging
+import uuid
+
+from redis.exceptions import ResponseError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.utils import create_refresh_token, REFRESH_TOKEN_EXPIRE_DAYS
+from app.database.models.refresh_token import RefreshToken
+from app.database.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Сессии (refresh-токены) хранятся в refresh_tokens — очистка Redis никого не
+# разлогинивает. Redis — read-through кэш активных сессий: session:{sha256 токена}
+# -> хэш (user_id, family_id, user_agent, created_at). Обменянные и отозванные
+# сессии из кэша удаляются, поэтому промах всегда проверяется по БД
+SESSION_TTL = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60  # в секундах
+# Ключей в одной команде DEL при массовом отзыве
+SESSION_DELETE_CHUNK = 1000
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+def get_session_key(token_hash: str) -> str:
+    return f"session:{token_hash}"
+
+# Сессии до переноса в БД лежали только в Redis под самим токеном
+def get_legacy_session_key(refresh_token: str) -> str:
+    return f"session:{refresh_token}"
+
+def get_legacy_user_sessions_key(user_id: int) -> str:
+    return f"user_sessions:{user_id}"
+
+
+def _session_fields(row: RefreshToken) -> Dict[str, str]:
+    return {
+        "user_id": str(row.user_id),
+        "family_id": row.family_id,
+        "user_agent": row.user_agent or "",
+        "created_at": str(row.created_at),
+    }
+
+# Ошибка Redis не должна ронять вход/обновление: источник истины — БД
+async def _cache_sessions(rows: Iterable[RefreshToken] = (), drop: Iterable[str] = ()):
+    rows, drop = list(rows), list(drop)
+    if not rows and not drop:
+        return
+    try:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(drop), SESSION_DELETE_CHUNK):
+                pipe.delete(*drop[start:start + SESSION_DELETE_CHUNK])
+            now = datetime.utcnow()
+            for row in rows:
+                session_key = get_session_key(row.token_hash)
+                pipe.hset(session_key, mapping=_session_fields(row))
+                # Даты в БД — naive UTC, поэтому TTL, а не EXPIREAT
+                pipe.expire(session_key, max(int((row.expires_at - now).total_seconds()), 1))
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to update session cache: {e}")
+
+async def _get_cached_session(token_hash: str) -> Optional[Dict[str, str]]:
+    try:
+        return await async_redis_client.client.hgetall(get_session_key(token_hash)) or None
+    except Exception as e:
+        logger.error(f"Redis HGETALL error: {e}")
+        return None
+
+def _new_session(user_id: int, user_agent: Optional[str], family_id: str):
+    refresh_token = create_refresh_token(user_id)
+    now = datetime.utcnow()
+    row = RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(refresh_token),
+        family_id=family_id,
+        user_agent=(user_agent or "")[:300],
+        created_at=now,
+        expires_at=now + timedelta(seconds=SESSION_TTL),
+    )
+    return refresh_token, row
+
+
+async def create_session(db: AsyncSession, user_id: int, user_agent: Optional[str]) -> str:
+    refresh_token, row = _new_session(user_id, user_agent, uuid.uuid4().hex)
+    db.add(row)
+    await db.commit()
+    await _cache_sessions([row])
+    logger.info(f"🔑 Session saved for user {user_id} (TTL: {SESSION_TTL}s)")
+    return refresh_token
+
+# Отзывает все ещё не отозванные токены семьи; возвращает число затронутых
+async def revoke_session_family(db: AsyncSession, family_id: str) -> int:
+    token_hashes = (await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.token_hash)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+    await _cache_sessions(drop=[get_session_key(token_hash) for token_hash in token_hashes])
+    return len(token_hashes)
+
+# Сессия, сохранённая до переноса в БД: хэш или (ещё раньше) JSON-строка
+async def _get_legacy_session_user_id(refresh_token: str) -> Optional[int]:
+    session_key = get_legacy_session_key(refresh_token)
+    try:
+        user_id = await async_redis_client.client.hget(session_key, "user_id")
+    except ResponseError:
+        session = await async_redis_client.get(session_key)
+        user_id = session and session.get("user_id")
+    except Exception as e:
+        logger.error(f"Redis HGET error: {e}")
+        return None
+    return int(user_id) if user_id is not None else None
+
+async def _drop_legacy_session(refresh_token: str, user_id: int) -> bool:
+    try:
+        async with async_redis_client.pipeline() as pipe:
+            pipe.delete(get_legacy_session_key(refresh_token))
+            pipe.zrem(get_legacy_user_sessions_key(user_id), refresh_token)
+            deleted, _ = await pipe.execute()
+        return deleted > 0
+    except Exception as e:
+        logger.error(f"Failed to drop legacy session: {e}")
+        return False
+
+
+# Обменивает refresh-токен на новый. None — токен не принят: неизвестен,
+# истёк, отозван или уже был обменян (тогда заодно отзывается вся семья)
+async def rotate_session(db: AsyncSession, refresh_token: str, user_id: int) -> Optional[str]:
+    token_hash = hash_refresh_token(refresh_token)
+    session = await _get_cached_session(token_hash)
+
+    if session is None:
+        row = (await db.execute(
+            select(RefreshToken).where(RefreshToken.token_hash == token_hash)
+        )).scalar_one_or_none()
+        if row is None:
+            # Сессия из Redis, выданная до переноса в БД, — переводим в новую семью
+            if await _get_legacy_session_user_id(refresh_token) != user_id:
+                return None
+            new_token = await create_session(db, user_id, None)
+            await _drop_legacy_session(refresh_token, user_id)
+            return new_token
+        if row.rotated_at is not None or row.revoked_at is not None:
+            revoked = await revoke_session_family(db, row.family_id)
+            logger.warning(f"⚠️ Refresh token reuse for user {row.user_id}: family {row.family_id} revoked ({revoked} tokens)")
+            return None
+        session = _session_fields(row)
+
+    if int(session["user_id"]) != user_id:
+        return None
+
+    # Условный UPDATE: из двух параллельных обменов одного токена пройдёт один
+    now = datetime.utcnow()
+    rotated = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+        .returning(RefreshToken.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if rotated is None:
+        await db.rollback()
+        revoked = await revoke_session_family(db, session["family_id"])
+        logger.warning(f"⚠️ Refresh token reuse for user {user_id}: family {session['family_id']} revoked ({revoked} tokens)")
+        return None
+
+    new_token, new_row = _new_session(user_id, session["user_agent"], session["family_id"])
+    db.add(new_row)
+    await db.commit()
+    await _cache_sessions([new_row], drop=[get_session_key(token_hash)])
+    return new_token
+
+# Выход: отзывает токен. False — активной сессии с таким токеном не было
+async def revoke_session(db: AsyncSession, refresh_token: str, user_id: int) -> bool:
+    token_hash = hash_refresh_token(refresh_token)
+    revoked = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.user_id == user_id,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    await db.commit()
+    if revoked is not None:
+        await _cache_sessions(drop=[get_session_key(token_hash)])
+        return True
+    return await _drop_legacy_session(refresh_token, user_id)
+
+async def _drop_legacy_user_sessions(user_ids: List[int]):
+    try:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zrange(get_legacy_user_sessions_key(user_id), 0, -1)
+            indexes = await pipe.execute()
+        keys = [get_legacy_user_sessions_key(user_id) for user_id, tokens in zip(user_ids, indexes) if tokens]
+        keys += [get_legacy_session_key(token) for tokens in indexes for token in tokens]
+        if keys:
+            await _cache_sessions(drop=keys)
+    except Exception as e:
+        logger.error(f"Failed to drop legacy sessions: {e}")
+
+# Выход со всех устройств. Строки ищутся по индексу refresh_tokens(user_id),
+# а из Redis удаляются только ключи найденных сессий — работа пропорциональна
+# числу сессий этих пользователей, а не всех сессий в системе
+async def revoke_user_sessions(db: AsyncSession, user_ids: List[int]) -> int:
+    token_hashes = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.user_id.in_(user_ids),
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.token_hash)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+    await _cache_sessions(drop=[get_session_key(token_hash) for token_hash in token_hashes])
+    await _drop_legacy_user_sessions(user_ids)
+    return len(token_hashes)
+
+async def get_user_sessions(db: AsyncSession, user_id: int) -> List[RefreshToken]:
+    return (await db.execute(
+        select(RefreshToken)
+        .where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > datetime.utcnow(),
+        )
+        .order_by(RefreshToken.created_at.desc())
+    )).scalars().all()
@@ -1,65 +1,232 @@
 import jwt
+from jwt.algorithms import get_default_algorithms
 from datetime import datetime, timedelta
-from passlib.hash import argon2
 from fastapi import HTTPException, status, Depends, Request
 from app.database.models.user import User
-from app.database.database import get_db
-from app.database.redis_client import redis_client
+from app.auth.passwords import get_password_hash, verify_password
+from app.database.database import get_async_db
+from app.database.redis_client import async_redis_client
+from app.config import settings
 import logging
-from sqlalchemy.orm import Session
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
 import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "my_super_secret")
-ALGORITHM = "HS256"
+ALGORITHM = settings.jwt_algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 21
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+# Оба типа токенов подписаны одним ключом — различаются claim'ом typ
+TOKEN_TYPE_ACCESS = "access"
+TOKEN_TYPE_REFRESH = "refresh"
 
-def get_password_hash(password: str) -> str:
-    return argon2.hash(password)
+# Ключи разбираются один раз при старте: jwt.encode/decode с готовым объектом
+# ключа не парсят PEM на каждый вызов. Сервису, который только проверяет токены,
+# достаточно публичного ключа — подписывать он не сможет
+def load_signing_keys(
+    algorithm: str,
+    secret: str,
+    private_key_path: Optional[str] = None,
+    public_key_path: Optional[str] = None,
+) -> Tuple[object, object]:
+    if algorithm == "HS256":
+        return secret, secret
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
 
-def verify_password(password: str, hashed: str) -> bool:
-    return argon2.verify(password, hashed)
+    jwt_algorithm = get_default_algorithms()[algorithm]
+
+    def read_key(path: str):
+        with open(path, "rb") as f:
+            return jwt_algorithm.prepare_key(f.read())
+
+    signing_key = read_key(private_key_path) if private_key_path else None
+    if public_key_path:
+        verify_key = read_key(public_key_path)
+    elif signing_key is not None:
+        verify_key = signing_key.public_key()
+    else:
+        raise ValueError(f"{algorithm} requires JWT_PRIVATE_KEY_PATH or JWT_PUBLIC_KEY_PATH")
+    return signing_key, verify_key
+
+SIGNING_KEY, VERIFY_KEY = load_signing_keys(
+    ALGORITHM, SECRET_KEY, settings.jwt_private_key_path, settings.jwt_public_key_path,
+)
 
 def create_access_token(
     user_id: int, 
     is_admin: bool = False, 
     is_verified: bool = False,
+    name: Optional[str] = None,
+    token_version: Optional[int] = None,
 ):
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {
         "sub": str(user_id),
+        "typ": TOKEN_TYPE_ACCESS,
         "exp": expire,
         "admin": is_admin,
         "verified": is_verified,
     }
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    # С name и ver пользователя можно восстановить из самого токена
+    if name is not None and token_version is not None:
+        payload["name"] = name
+        payload["ver"] = token_version
+    return jwt.encode(payload, SIGNING_KEY, algorithm=ALGORITHM)
+
+def create_user_access_token(user: User):
+    return create_access_token(user.id, user.is_admin, user.is_verified, user.name, user.token_version)
 
 def create_refresh_token(user_id: int):
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     import uuid
     return jwt.encode(
-        {"sub": str(user_id), "exp": expire, "jti": str(uuid.uuid4())},
-        SECRET_KEY, algorithm=ALGORITHM
+        {"sub": str(user_id), "typ": TOKEN_TYPE_REFRESH, "exp": expire, "jti": str(uuid.uuid4())},
+        SIGNING_KEY, algorithm=ALGORITHM
     )
 
+# Токены, выданные до появления typ: у refresh-токенов был jti, у access-токенов — нет
+def get_token_type(payload: dict) -> str:
+    return payload.get("typ") or (TOKEN_TYPE_REFRESH if "jti" in payload else TOKEN_TYPE_ACCESS)
+
+# Расшифрованные claims по sha256 токена: подпись и JSON проверяются один раз
+# за жизнь токена в воркере. exp сверяется при каждом попадании, а отзыв
+# по-прежнему идёт через ver, так что кэш его не обходит
+class DecodedTokenCache:
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1]
+
+    def set(self, digest: bytes, payload: dict):
+        # Токен без exp не истекает — такие не кэшируем
+        if self.size <= 0 or "exp" not in payload:
+            return
+        with self._lock:
+            self._entries[digest] = (payload["exp"], payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+decoded_tokens = DecodedTokenCache(settings.jwt_decode_cache_size)
+
 def decode_token(token: str):
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = decoded_tokens.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, VERIFY_KEY, algorithms=[ALGORITHM])
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        decoded_tokens.set(digest, payload)
+    # Копия, чтобы вызывающий код не испортил закэшированные claims
+    return dict(payload)
+
+# Пользователь, восстановленный из claims access-токена (без похода в Redis/БД)
+class TokenUser:
+    __slots__ = ("id", "name", "is_admin", "is_verified")
+
+    def __init__(self, id: int, name: str, is_admin: bool, is_verified: bool):
+        self.id = id
+        self.name = name
+        self.is_admin = is_admin
+        self.is_verified = is_verified
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def get_token_version_key(user_id: int) -> str:
+    return f"token_version:{user_id}"
+
+# Текущая версия живёт в users.token_version; Redis и локальный кэш процесса —
+# только её копии. TTL не больше срока жизни access-токена: даже если публикация
+# новой версии потеряется, отозванный токен к тому времени истечёт сам
+TOKEN_VERSION_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+async def get_token_version(user_id: int, db: AsyncSession) -> Optional[int]:
+    cache_key = get_token_version_key(user_id)
+    version = await async_redis_client.get(cache_key)
+    if version is not None:
+        return version
+
+    version = (await db.execute(
+        select(User.token_version).filter(User.id == user_id)
+    )).scalar_one_or_none()
+    # Только если ключа ещё нет: прочитанная версия могла устареть, пока шёл запрос,
+    # и перетирать записанную revoke_users_tokens новую версию ей нельзя
+    if version is not None:
+        await async_redis_client.add(cache_key, version, ttl=TOKEN_VERSION_TTL)
+    return version
+
+# Все ранее выданные access-токены пользователей перестают приниматься.
+# Один UPDATE по первичному ключу и одна пачка записей в Redis на всех
+async def revoke_users_tokens(user_ids: List[int], db: AsyncSession) -> Dict[int, int]:
+    versions = dict((await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(token_version=User.token_version + 1)
+        .returning(User.id, User.token_version)
+        .execution_options(synchronize_session=False)
+    )).all())
+    await db.commit()
+
+    # mset_with_ttl рассылает инвалидацию локальных кэшей остальным процессам
+    if versions:
+        await async_redis_client.mset_with_ttl(
+            {get_token_version_key(user_id): version for user_id, version in versions.items()},
+            ttl=TOKEN_VERSION_TTL,
+        )
+    for user_id in set(user_ids) - versions.keys():
+        await async_redis_client.delete(get_token_version_key(user_id))
+    return versions
+
+async def revoke_user_tokens(user_id: int, db: AsyncSession) -> Optional[int]:
+    return (await revoke_users_tokens([user_id], db)).get(user_id)
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db)):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
     token = auth_header.split(" ")[1]
     payload = decode_token(token)
+    # Refresh-токен живёт неделями и не несёт ver — как Bearer он не принимается
+    if get_token_type(payload) != TOKEN_TYPE_ACCESS:
+        raise HTTPException(status_code=401, detail="Invalid token type")
     user_id = int(payload["sub"])
+
+    # Версия проверяется всегда: токен без ver выдан до её появления и считается версией 0
+    version = await get_token_version(user_id, db)
+    if version is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("ver", 0) < version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    # Быстрый путь: всё нужное уже в токене
+    if settings.auth_stateless and "ver" in payload:
+        return TokenUser(user_id, payload["name"], payload["admin"], payload["verified"])
     
     # Попытка получить из кэша
-    cached_user = get_cached_user(user_id)
+    cached_user = await get_cached_user(user_id)
     if cached_user:
         logger.info(f"👤 User {user_id} loaded from CACHE")
         user = User(
@@ -74,19 +241,19 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
     
     # Если нет в кэше — берём из бд
     logger.info(f"🗄️  User {user_id} loaded from DATABASE")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(select(User).filter(User.id == user_id))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
     # Добавляем в кэш
-    cache_user(user)
+    await cache_user(user)
     
     return user
 
 def get_user_cache_key(user_id: int) -> str:
     return f"user:{user_id}"
 
-def cache_user(user: User):
+async def cache_user(user: User):
     cache_key = get_user_cache_key(user.id)
     # без hashed_password!
     user_data = {
@@ -97,8 +264,8 @@ def cache_user(user: User):
         "is_verified": user.is_verified,
         "avatar": user.avatar,
     }
-    redis_client.set(cache_key, user_data, ttl=600)
+    await async_redis_client.set(cache_key, user_data, ttl=600)
 
-def get_cached_user(user_id: int) -> dict:
+async def get_cached_user(user_id: int) -> dict:
     cache_key = get_user_cache_key(user_id)
-    return redis_client.get(cache_key)
+    return await async_redis_client.get(cache_key)
@@ -40,6 +40,27 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.send_weekly_digest",
         "schedule": crontab(day_of_week="sunday", hour=9, minute=0),  # Каждое воскресенье в 9:00
     },
+    "flush-news-views": {
+        "task": "app.tasks.flush_news_views",
+        "schedule": settings.news_views_flush_interval,
+        "options": {"expires": settings.news_views_flush_interval},
+    },
+    "rebuild-trending-news": {
+        "task": "app.tasks.rebuild_trending_news",
+        "schedule": settings.trending_rebuild_interval,
+        "options": {"expires": settings.trending_rebuild_interval},
+    },
+    "relay-outbox-events": {
+        "task": "app.tasks.relay_outbox_events",
+        "schedule": settings.outbox_relay_interval,
+        # Не копим запуски, если воркеры заняты: следующий всё равно заберёт все события
+        "options": {"expires": settings.outbox_relay_interval},
+    },
+    "purge-refresh-tokens": {
+        "task": "app.tasks.purge_refresh_tokens",
+        "schedule": settings.refresh_tokens_purge_interval,
+        "options": {"expires": settings.refresh_tokens_purge_interval},
+    },
 }
 
 @celery_app.task(bind=True)
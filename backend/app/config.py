@@ -1,21 +1,103 @@
+from typing import Optional
+
 from pydantic_settings import SettingsConfigDict, BaseSettings
 
 
 class Settings(BaseSettings):
     database_url: str
     redis_url: str = "redis://redis:6379/0"
+
+    # Пул соединений SQLAlchemy
+    db_echo: bool = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_slow_checkout_ms: int = 100
+    # DATABASE_URL указывает на PgBouncer в режиме transaction pooling
+    db_pgbouncer: bool = False
     secret_key: str = "my_super_secret"
     
     github_client_id: str = "FAKE_CLI"
     github_client_secret: str = "FAKE_SECRET"
     github_redirect_url: str = "http://localhost:8000/auth/github/callback"
     
+    # Параметры argon2 и пул процессов для хэширования паролей.
+    # По умолчанию — как у passlib, которым хэши считались раньше: стоимость новых хэшей не меняется
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 32
+
     access_token_expire_minutes: int = 15
+    # HS256 подписывает SECRET_KEY; для EdDSA/ES256 нужны PEM-файлы ключей.
+    # Публичного ключа достаточно, чтобы проверять токены без обращения к API
+    jwt_algorithm: str = "HS256"
+    jwt_private_key_path: Optional[str] = None
+    jwt_public_key_path: Optional[str] = None
+    # Сколько расшифрованных токенов помнить в каждом воркере
+    jwt_decode_cache_size: int = 10000
     refresh_token_expire_days: int = 21
     
     news_cache_ttl: int = 300
+    news_feed_cache_ttl: int = 60
     user_cache_ttl: int = 600
 
+    # Кэш в памяти процесса перед Redis
+    local_cache_enabled: bool = True
+    local_cache_ttl: int = 30
+    local_cache_user_size: int = 10000
+    local_cache_news_size: int = 1000
+    local_cache_feed_size: int = 1000
+    local_cache_token_version_size: int = 100000
+
+    # Пользователь собирается из claims access-токена, а не грузится из кэша/БД.
+    # token_version проверяется при любом значении
+    auth_stateless: bool = True
+
+    notification_batch_size: int = 1000
+    # Сколько помнить выполненные задачи для отсева дублей
+    task_dedup_ttl: int = 24 * 60 * 60
+
+    # Счётчики просмотров: Redis -> periodic flush в news.views
+    news_views_flush_interval: int = 60  # секунды
+    news_views_flush_batch_size: int = 500
+    news_views_flush_lock_ttl: int = 300
+    news_views_max_hours: int = 168
+    news_most_viewed_cache_ttl: int = 60
+
+    # Рейтинг "в тренде": вклад событий с экспоненциальным затуханием
+    trending_half_life_hours: float = 12
+    trending_news_weight: float = 10
+    trending_comment_weight: float = 3
+    trending_view_weight: float = 1
+    trending_window_days: int = 7
+    trending_size: int = 1000
+    trending_rebuild_interval: int = 600  # секунды
+
+    # Доставка событий из outbox в брокер
+    outbox_batch_size: int = 500
+    outbox_relay_interval: float = 2.0  # секунды
+
+    # Удаление истёкших refresh-токенов: пачками, каждая — отдельная транзакция
+    refresh_tokens_purge_batch_size: int = 1000
+    refresh_tokens_purge_interval: int = 60 * 60  # секунды
+
+    # Журнал уведомлений: буфер воркера, ротация файлов и сжатие
+    notification_log_buffer_bytes: int = 1024 * 1024
+    notification_log_flush_interval: int = 5  # секунды
+    notification_log_max_bytes: int = 100 * 1024 * 1024
+    notification_log_compress: bool = True
+    # Писать в лог каждого получателя отдельной строкой (DEBUG)
+    notification_log_recipients: bool = False
+
+    news_page_size: int = 20
+    news_page_max_size: int = 100
+    comments_page_size: int = 50
+    comments_page_max_size: int = 200
+
     class Config:
         env_file=".env"
         extra="ignore"
@@ -1,11 +1,104 @@
+import logging
+import time
+import uuid
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
 
 from app.config import settings
 
-engine = create_engine(settings.database_url, echo=True)
+logger = logging.getLogger(__name__)
+
+
+# Пул, который замеряет, сколько запрос ждал свободное соединение
+class TimedPoolMixin:
+    def _do_get(self):
+        start = time.perf_counter()
+        connection = super()._do_get()
+        wait_ms = (time.perf_counter() - start) * 1000
+        if wait_ms >= settings.db_pool_slow_checkout_ms:
+            logger.warning(f"DB pool checkout waited {wait_ms:.1f}ms ({self.status()})")
+        else:
+            logger.debug(f"DB pool checkout waited {wait_ms:.1f}ms")
+        return connection
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def get_async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        return url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return database_url
+
+
+def get_engine_options() -> dict:
+    options = {"echo": settings.db_echo}
+    if settings.db_pgbouncer:
+        # Пулом серверных соединений управляет PgBouncer (transaction pooling),
+        # поэтому свой пул не держим. psycopg2 не использует серверные
+        # prepared statements, так что для sync-движка больше ничего не нужно
+        options["poolclass"] = NullPool
+        return options
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+def get_async_engine_options() -> dict:
+    options = {"echo": settings.db_echo}
+    if settings.db_pgbouncer:
+        options["poolclass"] = NullPool
+        # asyncpg кэширует prepared statements на соединении, а PgBouncer
+        # в transaction pooling может отдать следующий запрос другому серверу
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+        return options
+
+    options.update(
+        poolclass=TimedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+# Синхронный движок — для Celery и Alembic
+engine = create_engine(settings.database_url, **get_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок (asyncpg) — для обработчиков запросов
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url), **get_async_engine_options()
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -15,3 +108,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
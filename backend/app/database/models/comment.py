@@ -1,13 +1,17 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, Text, DateTime
+from sqlalchemy import ForeignKey, Text, DateTime, Index, func, select, update
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.database import Base
+from app.database.models.news import News
 
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_news_id_publication_date_id", "news_id", "publication_date", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     text: Mapped[str] = mapped_column(Text)
@@ -16,4 +20,24 @@ class Comment(Base):
     publication_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     news = relationship("News", back_populates="comments")
-    author = relationship("User", back_populates="comments")
\ No newline at end of file
+    author = relationship("User", back_populates="comments")
+
+
+def last_comment_at_subquery():
+    return (
+        select(func.max(Comment.publication_date))
+        .where(Comment.news_id == News.id)
+        .scalar_subquery()
+    )
+
+# Полный пересчёт comment_count/last_comment_at по самим комментариям
+def recount_comment_stats(*criteria):
+    return (
+        update(News)
+        .where(*criteria)
+        .values(
+            comment_count=select(func.count(Comment.id)).where(Comment.news_id == News.id).scalar_subquery(),
+            last_comment_at=last_comment_at_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
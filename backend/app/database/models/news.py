@@ -1,21 +1,47 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, DateTime, String, JSON
+from sqlalchemy import ForeignKey, DateTime, String, JSON, Index, Integer, literal_column
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.database import Base
 
+# Конфигурация полнотекстового поиска; должна совпадать с генерируемой колонкой в миграции
+SEARCH_CONFIG = "russian"
+
 
 class News(Base):
     __tablename__ = "news"
+    __table_args__ = (
+        Index("ix_news_publication_date_id", "publication_date", "id"),
+        Index(
+            "ix_news_content",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "jsonb_path_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(200))
-    content: Mapped[JSON] = mapped_column(JSON)
+    # В Postgres — JSONB, в SQLite (тесты) — обычный JSON
+    content: Mapped[JSON] = mapped_column(JSON().with_variant(JSONB(), "postgresql"))
     publication_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     cover: Mapped[Optional[str]] = mapped_column(String(200))
+    # Денормализованная статистика комментариев, чтобы лента не считала их сама
+    comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    last_comment_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # Накапливается в Redis и переносится сюда пачками (app.news_views.flush_views)
+    views: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Последний перенос, учтённый в views: повторное применение той же пачки пропускается
+    views_flush_id: Mapped[Optional[str]] = mapped_column(String(32))
 
     author = relationship("User", back_populates="news")
-    comments = relationship("Comment", back_populates="news", cascade="all, delete-orphan")
\ No newline at end of file
+    comments = relationship("Comment", back_populates="news", cascade="all, delete-orphan")
+
+
+# search_vector — колонка Postgres (title + строки из content), которую заполняет триггер; с GIN-индексом.
+# В модели её нет: она не нужна при чтении новостей и не создаётся в SQLite
+news_search_vector = literal_column("news.search_vector", TSVECTOR)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database.database import Base
+
+NEWS_CREATED_EVENT = "news_created"
+
+# Событие пишется в той же транзакции, что и изменение данных,
+# а в брокер его доставляет relay_outbox_events
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[JSON] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Событие, которое relay не умеет доставить (неизвестный тип): остаётся в таблице для разбора
+    failed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
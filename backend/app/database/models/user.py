@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, String, Boolean
+from sqlalchemy import DateTime, String, Boolean, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.database import Base
@@ -18,6 +18,8 @@ class User(Base):
     registration_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
     avatar: Mapped[Optional[str]] = mapped_column(String(200))
+    # Увеличивается при смене прав/данных и отзыве сессий; токены со старой версией не принимаются
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     news = relationship("News", back_populates="author", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="author", cascade="all, delete-orphan")
\ No newline at end of file
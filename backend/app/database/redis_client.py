@@ -1,48 +1,339 @@
+import asyncio
 import redis
+import redis.asyncio as aioredis
 import json
 import logging
-from typing import Optional, Any
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional, Any, Dict, List, Tuple
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Канал, через который воркеры сообщают друг другу об изменённых ключах
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+_MISSING = object()
+
+
+# Первый уровень кэша: LRU в памяти процесса с TTL и лимитом на каждый неймспейс.
+# Кэшируются только ключи из известных неймспейсов (user:, news:, feed:), сессии сюда не попадают
+class LocalCache:
+    def __init__(self, limits: Dict[str, int], ttl: int):
+        self.limits = limits
+        self.ttl = ttl
+        self._entries: Dict[str, "OrderedDict[str, Tuple[float, Any]]"] = {
+            namespace: OrderedDict() for namespace in limits
+        }
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Растёт при каждой инвалидации: значение, прочитанное из Redis до неё, не кэшируем
+        self.generation = 0
+
+    def _namespace(self, key: str) -> Optional[str]:
+        for namespace in self.limits:
+            if key.startswith(namespace):
+                return namespace
+        return None
+
+    def accepts(self, key: str) -> bool:
+        return self._namespace(key) is not None
+
+    def get(self, key: str) -> Any:
+        namespace = self._namespace(key)
+        if namespace is None:
+            return _MISSING
+        with self._lock:
+            entries = self._entries[namespace]
+            entry = entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return _MISSING
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, generation: Optional[int] = None):
+        namespace = self._namespace(key)
+        if namespace is None:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            entries = self._entries[namespace]
+            entries[key] = (time.monotonic() + ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.limits[namespace]:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        namespace = self._namespace(key)
+        if namespace is None:
+            return
+        with self._lock:
+            self.generation += 1
+            self._entries[namespace].pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            for entries in self._entries.values():
+                entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": {namespace: len(entries) for namespace, entries in self._entries.items()},
+            }
+
+
 class RedisClient:
     def __init__(self):
         self.client = redis.from_url(
             settings.redis_url,
             decode_responses=True
         )
-    
+        # Отдельный клиент для готовых (уже сериализованных) байтов
+        self.binary_client = redis.from_url(settings.redis_url)
+
+        self.local = LocalCache(
+            limits={
+                "user:": settings.local_cache_user_size,
+                "news:": settings.local_cache_news_size,
+                "feed:": settings.local_cache_feed_size,
+                "token_version:": settings.local_cache_token_version_size,
+            },
+            ttl=settings.local_cache_ttl,
+        ) if settings.local_cache_enabled else None
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+        # Подписка на инвалидации запускается лениво — уже в процессе воркера (после fork)
+        self._instance_id = None
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+        self._subscriber_retry_at = 0.0
+
+    def _ensure_subscriber(self) -> bool:
+        if self._subscriber is not None:
+            return True
+        if time.monotonic() < self._subscriber_retry_at:
+            return False
+        with self._subscriber_lock:
+            if self._subscriber is not None:
+                return True
+            try:
+                self._instance_id = f"{os.getpid()}-{uuid.uuid4().hex}"
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidation})
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1,
+                    daemon=True,
+                    exception_handler=self._on_subscriber_error,
+                )
+                logger.info(f"Subscribed to {INVALIDATION_CHANNEL}")
+                return True
+            except Exception as e:
+                logger.error(f"Redis SUBSCRIBE error: {e}")
+                self._subscriber_retry_at = time.monotonic() + 5
+                return False
+
+    def _on_invalidation(self, message):
+        sender, _, key = message["data"].partition(":")
+        if sender != self._instance_id:
+            self.local.delete(key)
+
+    def _on_subscriber_error(self, error, pubsub, thread):
+        # Пока подписки нет, инвалидации теряются — сбрасываем локальный уровень целиком
+        logger.error(f"Redis invalidation subscriber error: {error}")
+        thread.stop()
+        pubsub.close()
+        self._subscriber = None
+        self.local.clear()
+
+    # Без подписки локальный уровень не используется: мы бы не узнали об изменениях
+    def _local_get(self, key: str) -> Any:
+        if self.local is None or not self.local.accepts(key) or not self._ensure_subscriber():
+            return _MISSING
+        return self.local.get(key)
+
+    # Счётчики общие для потоков процесса (и синхронного, и асинхронного клиента)
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _local_generation(self) -> Optional[int]:
+        return self.local.generation if self.local is not None else None
+
+    def _local_set(self, key: str, value: Any, ttl: Optional[int] = None, generation: Optional[int] = None):
+        if self.local is not None and self.local.accepts(key) and self._subscriber is not None:
+            self.local.set(key, value, ttl, generation)
+
+    def _publish_invalidation(self, pipe, key: str):
+        if self.local is not None and self.local.accepts(key):
+            self._ensure_subscriber()
+            self.local.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, f"{self._instance_id}:{key}")
+
     def get(self, key: str) -> Optional[Any]:
+        value = self._local_get(key)
+        if value is not _MISSING:
+            return value
+        generation = self._local_generation()
         try:
             value = self.client.get(key)
             if value:
+                self._count(True)
                 logger.info(f"Cache HIT: {key}")
-                return json.loads(value)
+                value = json.loads(value)
+                self._local_set(key, value, generation=generation)
+                return value
+            self._count(False)
             logger.info(f"Cache MISS: {key}")
             return None
         except Exception as e:
             logger.error(f"Redis GET error: {e}")
             return None
-    
+
     def set(self, key: str, value: Any, ttl: int = 300):
         try:
-            self.client.setex(
-                key,
-                ttl,
-                json.dumps(value, default=str)
-            )
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    key,
+                    ttl,
+                    json.dumps(value, default=str)
+                )
+                self._publish_invalidation(pipe, key)
+                pipe.execute()
             logger.info(f"Cache SET: {key} (TTL: {ttl}s)")
         except Exception as e:
             logger.error(f"Redis SET error: {e}")
-    
+
+    # SET NX: заполнение кэша после промаха не перетирает значение, записанное
+    # тем временем обычным set (например, новое после изменения в БД)
+    def add(self, key: str, value: Any, ttl: int = 300) -> bool:
+        generation = self._local_generation()
+        try:
+            if not self.client.set(key, json.dumps(value, default=str), nx=True, ex=ttl):
+                return False
+            self._local_set(key, value, ttl, generation)
+            logger.info(f"Cache ADD: {key} (TTL: {ttl}s)")
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET NX error: {e}")
+            return False
+
     def delete(self, key: str):
         try:
-            self.client.delete(key)
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                self._publish_invalidation(pipe, key)
+                pipe.execute()
             logger.info(f"Cache DELETE: {key}")
         except Exception as e:
             logger.error(f"Redis DELETE error: {e}")
-    
+
+    def get_raw(self, key: str, local: bool = True) -> Optional[bytes]:
+        if local:
+            value = self._local_get(key)
+            if value is not _MISSING:
+                return value
+        generation = self._local_generation()
+        try:
+            value = self.binary_client.get(key)
+            if value is not None:
+                self._count(True)
+                logger.info(f"Cache HIT: {key}")
+                if local:
+                    self._local_set(key, value, generation=generation)
+                return value
+            self._count(False)
+            logger.info(f"Cache MISS: {key}")
+            return None
+        except Exception as e:
+            logger.error(f"Redis GET error: {e}")
+            return None
+
+    # invalidate=False — для ключей, значение под которыми не меняется (версионированные
+    # страницы ленты): рассылать инвалидацию другим процессам незачем
+    def set_raw(self, key: str, value: bytes, ttl: int = 300, invalidate: bool = True):
+        try:
+            with self.binary_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, value)
+                if invalidate:
+                    self._publish_invalidation(pipe, key)
+                pipe.execute()
+            self._local_set(key, value, ttl)
+            logger.info(f"Cache SET: {key} (TTL: {ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis SET error: {e}")
+
+    # Несколько ключей одним MGET. Локальный уровень не используется
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            values = self.client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+        return [json.loads(value) if value else None for value in values]
+
+    def mset_with_ttl(self, mapping: Dict[str, Any], ttl: int = 300):
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttl, json.dumps(value, default=str))
+                    self._publish_invalidation(pipe, key)
+                pipe.execute()
+            logger.info(f"Cache MSET: {len(mapping)} keys (TTL: {ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis MSET error: {e}")
+
+    # GETDEL (Redis >= 6.2): прочитать и удалить одной командой
+    def get_and_delete(self, key: str) -> Optional[Any]:
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.getdel(key)
+                self._publish_invalidation(pipe, key)
+                value = pipe.execute()[0]
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.error(f"Redis GETDEL error: {e}")
+            return None
+
+    # По умолчанию MULTI/EXEC: команды пачки применяются атомарно. execute() вызывает
+    # сам код внутри блока — ему же нужны результаты команд
+    @contextmanager
+    def pipeline(self, transaction: bool = True, binary: bool = False):
+        client = self.binary_client if binary else self.client
+        with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+    def incr(self, key: str) -> Optional[int]:
+        try:
+            return self.client.incr(key)
+        except Exception as e:
+            logger.error(f"Redis INCR error: {e}")
+            return None
+
     def exists(self, key: str) -> bool:
         try:
             return self.client.exists(key) > 0
@@ -50,4 +341,202 @@ class RedisClient:
             logger.error(f"Redis EXISTS error: {e}")
             return False
 
+    def stats(self) -> dict:
+        with self._stats_lock:
+            redis_stats = {"hits": self.hits, "misses": self.misses, "evictions": None}
+        try:
+            redis_stats["evictions"] = self.client.info("stats").get("evicted_keys")
+        except Exception as e:
+            logger.error(f"Redis INFO error: {e}")
+        return {
+            "local": self.local.stats() if self.local else None,
+            "redis": redis_stats,
+        }
+
+
+# Асинхронный вариант для обработчиков запросов. Локальный уровень и подписка
+# на инвалидации общие с синхронным клиентом того же процесса
+class AsyncRedisClient:
+    def __init__(self, sync_client: RedisClient):
+        self.client = aioredis.from_url(
+            settings.redis_url,
+            decode_responses=True
+        )
+        self.binary_client = aioredis.from_url(settings.redis_url)
+        self._sync = sync_client
+        self.local = sync_client.local
+
+    async def _ensure_subscriber(self) -> bool:
+        if self._sync._subscriber is not None:
+            return True
+        if time.monotonic() < self._sync._subscriber_retry_at:
+            return False
+        # Подключение блокирующее — не держим им event loop
+        return await asyncio.to_thread(self._sync._ensure_subscriber)
+
+    async def _local_get(self, key: str) -> Any:
+        if self.local is None or not self.local.accepts(key) or not await self._ensure_subscriber():
+            return _MISSING
+        return self.local.get(key)
+
+    async def _publish_invalidation(self, pipe, key: str):
+        if self.local is not None and self.local.accepts(key):
+            await self._ensure_subscriber()
+            self.local.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, f"{self._sync._instance_id}:{key}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._local_get(key)
+        if value is not _MISSING:
+            return value
+        generation = self._sync._local_generation()
+        try:
+            value = await self.client.get(key)
+            if value:
+                self._sync._count(True)
+                logger.info(f"Cache HIT: {key}")
+                value = json.loads(value)
+                self._sync._local_set(key, value, generation=generation)
+                return value
+            self._sync._count(False)
+            logger.info(f"Cache MISS: {key}")
+            return None
+        except Exception as e:
+            logger.error(f"Redis GET error: {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: int = 300):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    key,
+                    ttl,
+                    json.dumps(value, default=str)
+                )
+                await self._publish_invalidation(pipe, key)
+                await pipe.execute()
+            logger.info(f"Cache SET: {key} (TTL: {ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis SET error: {e}")
+
+    async def add(self, key: str, value: Any, ttl: int = 300) -> bool:
+        generation = self._sync._local_generation()
+        try:
+            if not await self.client.set(key, json.dumps(value, default=str), nx=True, ex=ttl):
+                return False
+            self._sync._local_set(key, value, ttl, generation)
+            logger.info(f"Cache ADD: {key} (TTL: {ttl}s)")
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET NX error: {e}")
+            return False
+
+    async def delete(self, key: str):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                await self._publish_invalidation(pipe, key)
+                await pipe.execute()
+            logger.info(f"Cache DELETE: {key}")
+        except Exception as e:
+            logger.error(f"Redis DELETE error: {e}")
+
+    async def get_raw(self, key: str, local: bool = True) -> Optional[bytes]:
+        if local:
+            value = await self._local_get(key)
+            if value is not _MISSING:
+                return value
+        generation = self._sync._local_generation()
+        try:
+            value = await self.binary_client.get(key)
+            if value is not None:
+                self._sync._count(True)
+                logger.info(f"Cache HIT: {key}")
+                if local:
+                    self._sync._local_set(key, value, generation=generation)
+                return value
+            self._sync._count(False)
+            logger.info(f"Cache MISS: {key}")
+            return None
+        except Exception as e:
+            logger.error(f"Redis GET error: {e}")
+            return None
+
+    async def set_raw(self, key: str, value: bytes, ttl: int = 300, invalidate: bool = True):
+        try:
+            async with self.binary_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, value)
+                if invalidate:
+                    await self._publish_invalidation(pipe, key)
+                await pipe.execute()
+            self._sync._local_set(key, value, ttl)
+            logger.info(f"Cache SET: {key} (TTL: {ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis SET error: {e}")
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            values = await self.client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+        return [json.loads(value) if value else None for value in values]
+
+    async def mset_with_ttl(self, mapping: Dict[str, Any], ttl: int = 300):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttl, json.dumps(value, default=str))
+                    await self._publish_invalidation(pipe, key)
+                await pipe.execute()
+            logger.info(f"Cache MSET: {len(mapping)} keys (TTL: {ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis MSET error: {e}")
+
+    async def get_and_delete(self, key: str) -> Optional[Any]:
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.getdel(key)
+                await self._publish_invalidation(pipe, key)
+                value = (await pipe.execute())[0]
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.error(f"Redis GETDEL error: {e}")
+            return None
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True, binary: bool = False):
+        client = self.binary_client if binary else self.client
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+    async def incr(self, key: str) -> Optional[int]:
+        try:
+            return await self.client.incr(key)
+        except Exception as e:
+            logger.error(f"Redis INCR error: {e}")
+            return None
+
+    async def exists(self, key: str) -> bool:
+        try:
+            return await self.client.exists(key) > 0
+        except Exception as e:
+            logger.error(f"Redis EXISTS error: {e}")
+            return False
+
+    async def stats(self) -> dict:
+        with self._sync._stats_lock:
+            redis_stats = {"hits": self._sync.hits, "misses": self._sync.misses, "evictions": None}
+        try:
+            redis_stats["evictions"] = (await self.client.info("stats")).get("evicted_keys")
+        except Exception as e:
+            logger.error(f"Redis INFO error: {e}")
+        return {
+            "local": self.local.stats() if self.local else None,
+            "redis": redis_stats,
+        }
+
 redis_client = RedisClient()
+async_redis_client = AsyncRedisClient(redis_client)
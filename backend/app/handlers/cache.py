@@ -0,0 +1,13 @@
+from fastapi import Depends, APIRouter
+
+from app.database.redis_client import async_redis_client
+from app.auth.dependencies import admin_required
+
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+
+@router.get("/stats")
+async def get_cache_stats(current_user=Depends(admin_required)):
+    # Счётчики попаданий/промахов/вытеснений по уровням кэша этого воркера
+    return await async_redis_client.stats()
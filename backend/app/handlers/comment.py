@@ -1,48 +1,77 @@
-from fastapi import Depends, status, HTTPException, APIRouter
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import Depends, status, HTTPException, APIRouter, Query, Response
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from datetime import datetime
 from typing import Optional, List
 
-from app.database.database import get_db
-from app.database.models.comment import Comment
+from app.database.database import get_async_db
+from app.database.models.comment import Comment, last_comment_at_subquery
+from app.database.redis_client import async_redis_client
+from app.handlers.news import get_news_cache_key
+from app import trending
 from app.database.models.news import News
 from app.database.models.user import User
-from app.models.comment import CommentResponse, CommentCreate
+from app.models.comment import CommentResponse, CommentCreate, CommentPage
 from app.auth.utils import get_current_user
 from app.auth.dependencies import comment_owner_or_admin
+from app.config import settings
+from app.pagination import encode_cursor, decode_cursor
 
 
 router = APIRouter(prefix="/comments", tags=["comments"])
+# Комментарии конкретной новости: /news/{news_id}/comments
+news_comments_router = APIRouter(prefix="/news", tags=["comments"])
+
+# Автор подгружается тем же запросом и только нужные CommentResponse поля (без N+1)
+def with_author():
+    return joinedload(Comment.author, innerjoin=True).load_only(User.id, User.name)
 
 
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
-def create_comment(
+async def create_comment(
     comment: CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
-    news = db.execute(select(News).filter(News.id == comment.news_id)).scalar_one_or_none()
-
-    if not news:
+    now = datetime.utcnow()
+
+    # Счётчик обновляется в той же транзакции, что и вставка; заодно это проверка,
+    # что новость существует (UPDATE ... RETURNING вместо отдельного SELECT)
+    updated = (await db.execute(
+        update(News)
+        .where(News.id == comment.news_id)
+        .values(comment_count=News.comment_count + 1, last_comment_at=now)
+        .returning(News.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+
+    if not updated:
         raise HTTPException(status_code=404, detail="News not found")
 
     new_comment = Comment(
         news_id=comment.news_id,
         text=comment.text,
-        author_id=current_user.id
+        author_id=current_user.id,
+        publication_date=now,
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.commit()
+    await db.refresh(new_comment, ["author"])
+
+    await async_redis_client.delete(get_news_cache_key(comment.news_id))
+    await trending.bump(comment.news_id, settings.trending_comment_weight)
     return new_comment
 
 
 @router.get("/{comment_id}", response_model=CommentResponse)
-def get_comment(
+async def get_comment(
     comment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    comment = db.execute(select(Comment).filter(Comment.id == comment_id)).scalar_one_or_none()
+    comment = (await db.execute(
+        select(Comment).options(with_author()).filter(Comment.id == comment_id)
+    )).scalar_one_or_none()
 
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
@@ -50,36 +79,93 @@ def get_comment(
 
 
 @router.put("/{comment_id}", response_model=CommentResponse)
-def update_comment(
+async def update_comment(
     comment_id: int, 
     comment: CommentCreate,
     db_comment: Comment = Depends(comment_owner_or_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     db_comment.text = comment.text
 
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment, ["author"])
     return db_comment
 
 
 @router.delete("/{comment_id}")
-def delete_comment(
+async def delete_comment(
     comment_id: int,
     db_comment: Comment = Depends(comment_owner_or_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db.delete(db_comment)
-    db.commit()
+    news_id = db_comment.news_id
+    await db.delete(db_comment)
+    await db.flush()
+    await db.execute(
+        update(News)
+        .where(News.id == news_id)
+        .values(comment_count=News.comment_count - 1, last_comment_at=last_comment_at_subquery())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    await async_redis_client.delete(get_news_cache_key(news_id))
     return {"message": "Comment deleted successfully"}
 
+# Без news_id отдаём только последние комментарии и не больше comments_page_max_size.
+# С news_id — как раньше, все комментарии новости, если limit не передан явно:
+# обрезка по умолчанию молча потеряла бы хвост у старых клиентов.
+# Новым клиентам — постраничный /news/{news_id}/comments (заголовок Link)
 @router.get("/", response_model=List[CommentResponse])
-def get_comments(
+async def get_comments(
+    response: Response,
     news_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=settings.comments_page_max_size),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    query = select(Comment).options(with_author())
     if news_id:
-        comments = db.query(Comment).filter(Comment.news_id == news_id).all()
+        query = query.filter(Comment.news_id == news_id).order_by(Comment.publication_date, Comment.id)
+        response.headers["Deprecation"] = "true"
+        response.headers["Link"] = f'</news/{news_id}/comments>; rel="successor-version"'
     else:
-        comments = db.query(Comment).all()
+        query = query.order_by(Comment.id.desc())
+        limit = limit or settings.comments_page_size
+    if limit:
+        query = query.limit(limit)
+    comments = (await db.execute(query)).scalars().all()
     return comments
+
+
+@news_comments_router.get("/{news_id}/comments", response_model=CommentPage)
+async def get_news_comments(
+    news_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.comments_page_size, ge=1, le=settings.comments_page_max_size),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Keyset по индексу (news_id, publication_date, id), от старых к новым
+    query = (
+        select(Comment)
+        .options(with_author())
+        .filter(Comment.news_id == news_id)
+        .order_by(Comment.publication_date, Comment.id)
+    )
+    after = decode_cursor(cursor)
+    if after:
+        query = query.filter(tuple_(Comment.publication_date, Comment.id) > after)
+
+    comments = (await db.execute(query.limit(limit + 1))).scalars().all()
+
+    # Пустая первая страница — единственный случай, когда стоит проверить саму новость
+    if not comments and not cursor:
+        if not (await db.execute(select(News.id).filter(News.id == news_id))).scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="News not found")
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        last = comments[-1]
+        next_cursor = encode_cursor(last.publication_date, last.id)
+
+    return {"items": comments, "next_cursor": next_cursor}
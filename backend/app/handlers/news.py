@@ -1,30 +1,96 @@
-from fastapi import Depends, status, HTTPException, APIRouter
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import BackgroundTasks, Depends, status, HTTPException, APIRouter, Query, Response
+from sqlalchemy import select, tuple_, func, cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
 import logging
 
-from app.database.database import get_db
-from app.database.redis_client import redis_client
-from app.models.news import NewsResponse, NewsCreate
-from app.database.models.news import News
+from app.database.database import get_async_db
+from app.database.redis_client import async_redis_client
+from app.models.news import NewsResponse, NewsCreate, NewsPage, MostViewedNews, serialize_news
+from app.database.models.news import News, SEARCH_CONFIG, news_search_vector
+from app.database.models.user import User
+from app.database.models.outbox import OutboxEvent, NEWS_CREATED_EVENT
 from app.auth.utils import get_current_user
 from app.auth.dependencies import news_owner_or_admin, verified_author_required
 from app.config import settings
-from app.tasks import send_new_news_notification
+from app.news_views import record_view, get_most_viewed
+from app import trending
+from app.pagination import encode_cursor, decode_cursor, encode_rank_cursor, decode_rank_cursor
 
 
 router = APIRouter(prefix="/news", tags=["news"])
 logger = logging.getLogger(__name__)
 
+# Лента в своём неймспейсе: страницы не вытесняют новости из локального кэша
+FEED_VERSION_KEY = "feed:version"
+
 def get_news_cache_key(news_id: int) -> str:
     return f"news:{news_id}"
 
+# Страницы ленты кэшируются под текущей версией: после любой записи версия
+# увеличивается, и старые страницы просто перестают читаться (и истекают по TTL)
+async def get_feed_version() -> int:
+    version = await async_redis_client.get_raw(FEED_VERSION_KEY, local=False)
+    return int(version) if version else 0
+
+def get_feed_cache_key(
+    version: int,
+    cursor: Optional[str],
+    limit: int,
+    block_type: Optional[str] = None,
+    tag: Optional[str] = None,
+) -> str:
+    return f"feed:v{version}:{cursor or ''}:{limit}:{block_type or ''}:{tag or ''}"
+
+async def invalidate_news_feed():
+    await async_redis_client.incr(FEED_VERSION_KEY)
+
+# Автор подгружается тем же запросом и только нужные NewsResponse поля (без N+1)
+def with_author():
+    return joinedload(News.author, innerjoin=True).load_only(User.id, User.name)
+
+# Фильтр по содержимому через @> — обслуживается GIN-индексом ix_news_content
+def content_contains(fragment: dict):
+    return News.content.op("@>")(cast(fragment, JSONB))
+
+def build_feed_query(
+    after: Optional[tuple],
+    limit: int,
+    block_type: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    # Keyset-пагинация по (publication_date, id): стоимость страницы не зависит от глубины
+    query = select(News).options(with_author()).order_by(News.publication_date.desc(), News.id.desc())
+    if after:
+        query = query.filter(tuple_(News.publication_date, News.id) < after)
+    if block_type:
+        query = query.filter(content_contains({"blocks": [{"type": block_type}]}))
+    if tag:
+        query = query.filter(content_contains({"tags": [tag]}))
+    return query.limit(limit)
+
+# Поиск по GIN-индексу search_vector; страницы — keyset по (rank, id)
+def build_search_query(q: str, after: Optional[tuple], limit: int):
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(news_search_vector, ts_query).label("rank")
+
+    query = (
+        select(News, rank)
+        .options(with_author())
+        .filter(news_search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), News.id.desc())
+    )
+    if after:
+        query = query.filter(tuple_(rank, News.id) < after)
+    return query.limit(limit)
+
 
 @router.post("/", response_model=NewsResponse, status_code=status.HTTP_201_CREATED)
-def create_news(
+async def create_news(
     news: NewsCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(verified_author_required),
 ):
     new_news = News(
@@ -33,121 +99,198 @@ def create_news(
         cover=news.cover,
         author_id=current_user.id
     )
-    # Добавляем в бд
+    # Добавляем в бд вместе с событием для уведомлений — в одной транзакции,
+    # брокер на пути запроса не участвует
     db.add(new_news)
-    db.commit()
-    db.refresh(new_news)
-
-    # Добавляем в кэш
-    cache_key = get_news_cache_key(new_news.id)
-    news_dict = {
-        "id": new_news.id,
-        "title": new_news.title,
-        "content": new_news.content,
-        "cover": new_news.cover,
-        "author_id": new_news.author_id,
-        "publication_date": new_news.publication_date.isoformat(),
-        "author": {
-            "id": current_user.id,
-            "name": current_user.name
-        }
-    }
-    redis_client.set(cache_key, news_dict, settings.news_cache_ttl)
-
-    # Отправить уведомление о новой новости
-    send_new_news_notification.apply_async(
-        kwargs={
+    await db.flush()
+    db.add(OutboxEvent(
+        event_type=NEWS_CREATED_EVENT,
+        payload={
             "news_id": new_news.id,
             "news_title": new_news.title,
             "author_name": current_user.name
         }
+    ))
+    await db.commit()
+    await db.refresh(new_news)
+
+    # Добавляем в кэш
+    cache_key = get_news_cache_key(new_news.id)
+    payload = serialize_news(new_news, current_user.id, current_user.name)
+    await async_redis_client.set_raw(cache_key, payload, settings.news_cache_ttl)
+    await invalidate_news_feed()
+    await trending.add_news(new_news.id, payload)
+    logger.info(f"Outbox event queued for news {new_news.id}")
+
+    return Response(
+        content=payload,
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
     )
-    logger.info(f"Queued notification task for news {new_news.id}")
-    
 
-    return new_news
+
+@router.get("/search", response_model=NewsPage)
+async def search_news(
+    q: str = Query(..., min_length=2, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.news_page_size, ge=1, le=settings.news_page_max_size),
+    db: AsyncSession = Depends(get_async_db),
+):
+    after = decode_rank_cursor(cursor)
+    rows = (await db.execute(build_search_query(q, after, limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_rank_cursor(last.rank, last.News.id)
+
+    page = NewsPage.model_validate(
+        {"items": [row.News for row in rows], "next_cursor": next_cursor}, from_attributes=True
+    ).model_dump_json().encode()
+    return Response(content=page, media_type="application/json")
+
+
+# Рейтинг поддерживается в Redis (app.trending), Postgres на чтении не участвует
+@router.get("/trending", response_model=List[NewsResponse])
+async def get_trending_news(
+    limit: int = Query(settings.news_page_size, ge=1, le=settings.news_page_max_size),
+):
+    return Response(content=await trending.get_trending(limit), media_type="application/json")
+
+
+@router.get("/most-viewed", response_model=List[MostViewedNews])
+async def get_most_viewed_news(
+    hours: int = Query(24, ge=1, le=settings.news_views_max_hours),
+    limit: int = Query(10, ge=1, le=settings.news_page_max_size),
+    db: AsyncSession = Depends(get_async_db),
+):
+    top = await get_most_viewed(hours, limit)
+    if not top:
+        return []
+
+    news_by_id = {
+        news.id: news
+        for news in (await db.execute(
+            select(News).options(with_author()).filter(News.id.in_([news_id for news_id, _ in top]))
+        )).scalars()
+    }
+    # Порядок — по просмотрам из Redis; удалённые новости пропускаем
+    return [
+        MostViewedNews.model_validate(news_by_id[news_id], from_attributes=True).model_copy(
+            update={"recent_views": recent_views}
+        )
+        for news_id, recent_views in top
+        if news_id in news_by_id
+    ]
 
 
 @router.get("/{news_id}", response_model=NewsResponse)
-def get_news(
+async def get_news(
     news_id: int, 
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
 ):
     cache_key = get_news_cache_key(news_id)
     
-    # Попытка получить из кэша
-    cached_news = redis_client.get(cache_key)
+    # Попытка получить из кэша: отдаём байты как есть, без повторной валидации
+    cached_news = await async_redis_client.get_raw(cache_key)
     if cached_news:
         logger.info(f"📰 Returning news {news_id} from CACHE")
-        return NewsResponse(**cached_news)
+        # Просмотр учитывается уже после отправки ответа
+        background_tasks.add_task(record_view, news_id)
+        return Response(content=cached_news, media_type="application/json")
     
     # Если нет в кэше — берём из БД
     logger.info(f"🗄️  Fetching news {news_id} from DATABASE")
-    news = db.execute(select(News).filter(News.id == news_id)).scalar_one_or_none()
+    news = (await db.execute(
+        select(News).options(with_author()).filter(News.id == news_id)
+    )).scalar_one_or_none()
 
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
     
     # Добавляем в кэш
-    news_dict = {
-        "id": news.id,
-        "title": news.title,
-        "content": news.content,
-        "cover": news.cover,
-        "author_id": news.author_id,
-        "publication_date": news.publication_date.isoformat(),
-        "author": {
-            "id": news.author.id,
-            "name": news.author.name
-        } if news.author else None 
-    }
-    redis_client.set(cache_key, news_dict, settings.news_cache_ttl)
+    payload = serialize_news(news, news.author.id, news.author.name)
+    await async_redis_client.set_raw(cache_key, payload, settings.news_cache_ttl)
 
-    return news
+    background_tasks.add_task(record_view, news_id)
+    return Response(content=payload, media_type="application/json")
 
 
 @router.put("/{news_id}", response_model=NewsResponse)
-def update_news(
+async def update_news(
     news_id: int, 
     news: NewsCreate, 
     db_news: News = Depends(news_owner_or_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     db_news.title = news.title
     db_news.content = news.content
     db_news.cover = news.cover
 
     # Обновляем бд
-    db.commit()
-    db.refresh(db_news)
+    await db.commit()
+    await db.refresh(db_news, ["author"])
 
     # Обновляем кэш
     cache_key = get_news_cache_key(news_id)
-    redis_client.delete(cache_key)
+    await async_redis_client.delete(cache_key)
+    await invalidate_news_feed()
+    await trending.update_news(news_id, serialize_news(db_news, db_news.author.id, db_news.author.name))
     logger.info(f"🔄 News {news_id} updated, cache invalidated")
 
     return db_news
 
 
 @router.delete("/{news_id}")
-def delete_news(
+async def delete_news(
     news_id: int, 
     db_news: News = Depends(news_owner_or_admin),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Обновляем бд
-    db.delete(db_news)
-    db.commit()
+    await db.delete(db_news)
+    await db.commit()
 
     # Обновляем кэш
     cache_key = get_news_cache_key(news_id)
-    redis_client.delete(cache_key)
+    await async_redis_client.delete(cache_key)
+    await invalidate_news_feed()
+    await trending.remove_news([news_id])
     logger.info(f"🗑️  News {news_id} deleted, cache invalidated")
 
     return {"message": "News deleted successfully"}
 
-@router.get("/", response_model=List[NewsResponse])
-def get_all_news(db: Session = Depends(get_db)):
-    news = db.query(News).order_by(News.publication_date.desc()).all()
-    return news
+@router.get("/", response_model=NewsPage)
+async def get_all_news(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.news_page_size, ge=1, le=settings.news_page_max_size),
+    block_type: Optional[str] = Query(None, max_length=50),
+    tag: Optional[str] = Query(None, max_length=50),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Попытка получить готовую страницу из кэша — без ORM и Pydantic
+    cache_key = get_feed_cache_key(await get_feed_version(), cursor, limit, block_type, tag)
+    cached_page = await async_redis_client.get_raw(cache_key)
+    if cached_page:
+        logger.info(f"📰 Returning news feed page from CACHE")
+        return Response(content=cached_page, media_type="application/json")
+
+    # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+    query = build_feed_query(decode_cursor(cursor), limit + 1, block_type, tag)
+    news = (await db.execute(query)).scalars().all()
+
+    next_cursor = None
+    if len(news) > limit:
+        news = news[:limit]
+        last = news[-1]
+        next_cursor = encode_cursor(last.publication_date, last.id)
+
+    # Сериализуем один раз и кладём в кэш уже байтами
+    page = NewsPage.model_validate(
+        {"items": news, "next_cursor": next_cursor}, from_attributes=True
+    ).model_dump_json().encode()
+    await async_redis_client.set_raw(cache_key, page, settings.news_feed_cache_ttl, invalidate=False)
 
+    return Response(content=page, media_type="application/json")
@@ -1,43 +1,48 @@
 from fastapi import Depends, status, HTTPException, APIRouter
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.database import get_db
+from app.database.database import get_async_db
 from app.database.models.user import User
+from app.database.models.news import News
+from app.database.models.comment import Comment, recount_comment_stats
+from app.database.redis_client import async_redis_client
 from app.models.user import UserResponse, UserCreate
-from app.auth.utils import get_current_user, get_password_hash
+from app.auth.utils import get_current_user, get_password_hash, verify_password, revoke_user_tokens
 from app.auth.dependencies import admin_required
+from app.handlers.news import invalidate_news_feed, get_news_cache_key
+from app import trending
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user: UserCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(admin_required)
 ):
-    result = db.execute(select(User).filter(User.email == user.email))
+    result = await db.execute(select(User).filter(User.email == user.email))
     db_user = result.scalar_one_or_none()
 
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user.password = get_password_hash(user.password)
+    user.password = await get_password_hash(user.password)
     new_user = User(**user.dict())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    user = db.execute(select(User).filter(User.id == user_id)).scalar_one_or_none()
+    user = (await db.execute(select(User).filter(User.id == user_id))).scalar_one_or_none()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -45,13 +50,13 @@ def get_user(
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int, 
     user_update: UserCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_user = db.execute(select(User).filter(User.id == user_id)).scalar_one_or_none()
+    db_user = (await db.execute(select(User).filter(User.id == user_id))).scalar_one_or_none()
 
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -61,34 +66,46 @@ def update_user(
 
     # Проверяем, не занят ли email другим пользователем
     if user_update.email != db_user.email:
-        existing_user = db.execute(select(User).filter(User.email == user_update.email)).scalar_one_or_none()
+        existing_user = (await db.execute(select(User).filter(User.email == user_update.email))).scalar_one_or_none()
 
         if existing_user:
             raise HTTPException(status_code=400,detail="Email already registered by another user")
 
+    # Имя и статус верификации зашиты в выданные токены — при их смене токены отзываем
+    claims_changed = (db_user.name, db_user.is_verified) != (user_update.name, user_update.is_verified)
+    # Пароль приходит в каждом запросе: перехэшируем и отзываем токены, только если он новый
+    password_changed = bool(user_update.password) and not (
+        db_user.hashed_password and await verify_password(user_update.password, db_user.hashed_password)
+    )
+
     # Обновляем данные
     db_user.name = user_update.name
     db_user.email = user_update.email
     db_user.is_verified = user_update.is_verified
-    if user_update.password:
-        db_user.hashed_password = get_password_hash(user_update.password)
+    if password_changed:
+        db_user.hashed_password = await get_password_hash(user_update.password)
     
     
     if user_update.avatar:
         db_user.avatar = user_update.avatar 
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    if claims_changed or password_changed:
+        await revoke_user_tokens(db_user.id, db)
+    await db.refresh(db_user)
+
+    # Имя автора есть в закэшированных страницах ленты
+    await invalidate_news_feed()
     return db_user
 
 
 @router.delete("/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_user = db.execute(select(User).filter(User.id == user_id)).scalar_one_or_none()
+    db_user = (await db.execute(select(User).filter(User.id == user_id))).scalar_one_or_none()
 
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -96,7 +113,25 @@ def delete_user(
     if db_user.id != current_user.id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    db.delete(db_user)
-    db.commit()
+    # Новости, под которыми пользователь оставлял комментарии: их счётчики пересчитаем
+    commented_news = (await db.execute(
+        select(Comment.news_id).filter(Comment.author_id == user_id).distinct()
+    )).scalars().all()
+
+    # Новости пользователя удалятся каскадом — уберём их из рейтинга
+    own_news = (await db.execute(select(News.id).filter(News.author_id == user_id))).scalars().all()
+
+    await db.delete(db_user)
+    await db.flush()
+    if commented_news:
+        await db.execute(recount_comment_stats(News.id.in_(commented_news)))
+    await db.commit()
+    await revoke_user_tokens(user_id, db)
+
+    # Вместе с пользователем удалены и его новости
+    await invalidate_news_feed()
+    for news_id in commented_news:
+        await async_redis_client.delete(get_news_cache_key(news_id))
+    await trending.remove_news(own_news)
 
     return {"message": "User deleted successfully"}
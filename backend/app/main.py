@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from app.handlers import user, news, comment, auth
+from app.handlers import user, news, comment, auth, cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,4 +23,6 @@ app.add_middleware(
 app.include_router(user.router)
 app.include_router(news.router)
 app.include_router(comment.router)
+app.include_router(comment.news_comments_router)
 app.include_router(auth.router)
+app.include_router(cache.router)
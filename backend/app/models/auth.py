@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from typing import List
+from pydantic import BaseModel, EmailStr, Field, field_validator
 import re
 
 class RegisterRequest(BaseModel):
@@ -36,4 +37,10 @@ class RefreshRequest(BaseModel):
     refresh_token: str
 
 class LogoutRequest(BaseModel):
-    refresh_token: str
\ No newline at end of file
+    refresh_token: str
+
+# Массовый отзыв сессий администратором
+MAX_REVOKE_USERS = 1000
+
+class RevokeSessionsRequest(BaseModel):
+    user_ids: List[int] = Field(min_length=1, max_length=MAX_REVOKE_USERS)
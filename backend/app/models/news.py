@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Optional, Any
+from typing import Optional, Any, List
 
 from pydantic import BaseModel
+import orjson
 
 
 class AuthorShort(BaseModel):
@@ -27,6 +28,38 @@ class NewsResponse(NewsBase):
     author_id: int
     publication_date: datetime
     author: AuthorShort
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
+    views: int = 0
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class MostViewedNews(NewsResponse):
+    # Просмотры за запрошенный период (views — за всё время, с задержкой до flush)
+    recent_views: int = 0
+
+
+class NewsPage(BaseModel):
+    items: List[NewsResponse]
+    next_cursor: Optional[str] = None
+
+
+# Новость в кэше хранится готовым JSON — в том же виде, в каком уходит клиенту
+def serialize_news(news, author_id: int, author_name: str) -> bytes:
+    return orjson.dumps({
+        "title": news.title,
+        "content": news.content,
+        "cover": news.cover,
+        "id": news.id,
+        "author_id": news.author_id,
+        "publication_date": news.publication_date,
+        "comment_count": news.comment_count,
+        "last_comment_at": news.last_comment_at,
+        "views": news.views,
+        "author": {
+            "id": author_id,
+            "name": author_name
+        }
+    })
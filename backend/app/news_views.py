@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import logging
+import uuid
+
+from sqlalchemy import case, update
+
+from app.config import settings
+from app.database.models.news import News
+from app.database.redis_client import redis_client, async_redis_client
+from app.trending import queue_bump, execute_with_bumps
+
+logger = logging.getLogger(__name__)
+
+# Просмотры копятся в Redis: хэш приращений, которые ещё не попали в Postgres,
+# и почасовые sorted set'ы для "самых просматриваемых"
+VIEWS_PENDING_KEY = "views:pending"
+VIEWS_FLUSHING_KEY = "views:flushing"
+VIEWS_FLUSH_ID_KEY = "views:flushing:id"
+VIEWS_FLUSH_LOCK_KEY = "views:flush_lock"
+
+def get_views_hour_key(hour: datetime) -> str:
+    return f"views:hour:{hour.strftime('%Y%m%d%H')}"
+
+def get_views_top_key(hours: int) -> str:
+    return f"views:top:{hours}"
+
+
+# Одна пачка команд на просмотр (счётчики и рейтинг); потерянный просмотр не стоит ошибки запроса
+async def record_view(news_id: int):
+    hour_key = get_views_hour_key(datetime.utcnow())
+    client = async_redis_client.client
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(VIEWS_PENDING_KEY, news_id, 1)
+            pipe.zincrby(hour_key, 1, news_id)
+            pipe.expire(hour_key, (settings.news_views_max_hours + 1) * 60 * 60)
+            queue_bump(pipe, news_id, settings.trending_view_weight)
+            await execute_with_bumps(pipe, client)
+    except Exception as e:
+        logger.error(f"Failed to record view for news {news_id}: {e}")
+
+
+# Сумма почасовых счётчиков за последние hours часов. Объединение кэшируется
+# на news_most_viewed_cache_ttl, чтобы не пересчитывать его на каждый запрос
+async def get_most_viewed(hours: int, limit: int) -> List[Tuple[int, int]]:
+    top_key = get_views_top_key(hours)
+    client = async_redis_client.client
+
+    if not await client.exists(top_key):
+        now = datetime.utcnow()
+        hour_keys = [get_views_hour_key(now - timedelta(hours=i)) for i in range(hours)]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zunionstore(top_key, hour_keys)
+            pipe.expire(top_key, settings.news_most_viewed_cache_ttl)
+            await pipe.execute()
+
+    top = await client.zrevrange(top_key, 0, limit - 1, withscores=True)
+    return [(int(news_id), int(score)) for news_id, score in top]
+
+
+# Снимает блокировку, только если она всё ещё наша: по истечении TTL её мог взять другой запуск
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Переносит накопленные приращения в news.views. Хэш сначала атомарно
+# переименовывается вместе с записью id переноса, так что новые просмотры
+# копятся уже в свежем ключе. Каждая пачка после коммита удаляется из хэша.
+# UPDATE помечает строки id переноса и пропускает уже помеченные, поэтому
+# пачка, закоммиченная перед падением, но не удалённая из хэша, при следующем
+# запуске повторно не применится
+def flush_views(db) -> int:
+    client = redis_client.client
+    lock_token = uuid.uuid4().hex
+    if not client.set(VIEWS_FLUSH_LOCK_KEY, lock_token, nx=True, ex=settings.news_views_flush_lock_ttl):
+        logger.info("Views flush already running")
+        return 0
+
+    try:
+        if not client.exists(VIEWS_FLUSHING_KEY):
+            if not client.exists(VIEWS_PENDING_KEY):
+                # Новых просмотров не было
+                return 0
+            with client.pipeline(transaction=True) as pipe:
+                pipe.rename(VIEWS_PENDING_KEY, VIEWS_FLUSHING_KEY)
+                pipe.set(VIEWS_FLUSH_ID_KEY, uuid.uuid4().hex)
+                pipe.execute()
+        # Хэш, переименованный до появления id переноса
+        client.set(VIEWS_FLUSH_ID_KEY, uuid.uuid4().hex, nx=True)
+        flush_id = client.get(VIEWS_FLUSH_ID_KEY)
+
+        deltas = [(int(news_id), int(delta)) for news_id, delta in client.hgetall(VIEWS_FLUSHING_KEY).items()]
+        batch_size = settings.news_views_flush_batch_size
+        for start in range(0, len(deltas), batch_size):
+            batch = dict(deltas[start:start + batch_size])
+            db.execute(
+                update(News)
+                .where(News.id.in_(batch), News.views_flush_id.is_distinct_from(flush_id))
+                .values(views=News.views + case(batch, value=News.id, else_=0), views_flush_id=flush_id)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            client.hdel(VIEWS_FLUSHING_KEY, *batch)
+
+        client.delete(VIEWS_FLUSH_ID_KEY)
+        logger.info(f"Flushed views for {len(deltas)} news")
+        return len(deltas)
+    finally:
+        client.eval(RELEASE_LOCK_SCRIPT, 1, VIEWS_FLUSH_LOCK_KEY, lock_token)
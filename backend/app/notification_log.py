@@ -0,0 +1,146 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import atexit
+import gzip
+import logging
+import os
+import shutil
+import threading
+import orjson
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Буферизованный журнал уведомлений: одна NDJSON-строка на пачку получателей.
+# У каждого процесса воркера свой файл, поэтому записи не перемешиваются,
+# а ротация не требует межпроцессных блокировок
+class NotificationLogWriter:
+
+    def __init__(
+        self,
+        directory: Path,
+        buffer_bytes: int,
+        flush_interval: float,
+        max_bytes: int,
+        compress: bool,
+    ):
+        self.directory = directory
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered = 0
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def get_path(self, day: Optional[str] = None) -> Path:
+        day = day or datetime.utcnow().strftime("%Y%m%d")
+        return self.directory / f"notifications_{day}_{self._pid}.ndjson"
+
+    def write(self, record: dict):
+        line = orjson.dumps(record) + b"\n"
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered += len(line)
+            if self._buffered < self.buffer_bytes:
+                line = None
+        self._ensure_flusher()
+        if line is not None:
+            self.flush()
+
+    def flush(self):
+        rotated = None
+        with self._lock:
+            if not self._buffer:
+                return
+            data = b"".join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+
+            path = self.get_path()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "ab") as f:
+                    f.write(data)
+                    size = f.tell()
+            except Exception as e:
+                logger.error(f"Failed to write notification log: {e}")
+                return
+            if size >= self.max_bytes:
+                rotated = self._rotate(path)
+        # Сжатие — уже без блокировки, чтобы не задерживать запись
+        if rotated is not None and self.compress:
+            self._compress(rotated)
+
+    # Заполненный файл переименовывается в следующий свободный номер
+    def _rotate(self, path: Path) -> Path:
+        index = 1
+        while True:
+            rotated = path.with_suffix(f".{index}.ndjson")
+            if not rotated.exists() and not Path(f"{rotated}.gz").exists():
+                break
+            index += 1
+        path.rename(rotated)
+        logger.info(f"Notification log rotated: {rotated.name}")
+        return rotated
+
+    def _compress(self, path: Path):
+        try:
+            with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            path.unlink()
+        except Exception as e:
+            logger.error(f"Failed to compress notification log {path.name}: {e}")
+
+    # Фоновый поток сбрасывает буфер раз в flush_interval, даже если записей мало
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name="notification-log-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+_writer: Optional[NotificationLogWriter] = None
+_writer_lock = threading.Lock()
+
+# После fork у дочернего процесса не будет ни потока, ни своего файла —
+# такой writer пересоздаётся по pid
+def get_notification_writer(directory: Path) -> NotificationLogWriter:
+    global _writer
+    if _writer is None or _writer._pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer._pid != os.getpid():
+                _writer = NotificationLogWriter(
+                    directory,
+                    buffer_bytes=settings.notification_log_buffer_bytes,
+                    flush_interval=settings.notification_log_flush_interval,
+                    max_bytes=settings.notification_log_max_bytes,
+                    compress=settings.notification_log_compress,
+                )
+    return _writer
+
+def close_notification_writer():
+    if _writer is not None and _writer._pid == os.getpid():
+        _writer.close()
+
+atexit.register(close_notification_writer)
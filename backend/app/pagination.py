@@ -0,0 +1,51 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+# Курсор — непрозрачная для клиента строка: base64 от JSON со значениями ключа сортировки
+def _encode(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+# Лента: [publication_date, id]
+def encode_cursor(publication_date: datetime, item_id: int) -> str:
+    return _encode([publication_date.isoformat(), item_id])
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        publication_date, item_id = _decode(cursor)
+        return datetime.fromisoformat(publication_date), int(item_id)
+    except Exception:
+        raise _invalid_cursor()
+
+
+# Поиск: [rank, id] — ранг отдаём как есть, чтобы сравнение было точным
+def encode_rank_cursor(rank: float, item_id: int) -> str:
+    return _encode([rank, item_id])
+
+
+def decode_rank_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    try:
+        rank, item_id = _decode(cursor)
+        return float(rank), int(item_id)
+    except Exception:
+        raise _invalid_cursor()
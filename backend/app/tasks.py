@@ -1,13 +1,23 @@
 from celery import Task
+from sqlalchemy import select, delete, update
 from app.celery_app import celery_app
+from app.config import settings
+from app.database.redis_client import redis_client
+from app.news_views import flush_views
+from app.trending import rebuild_trending
+from app.notification_log import get_notification_writer, close_notification_writer
 from app.database.database import SessionLocal
 from app.database.models.user import User
 from app.database.models.news import News
-from app.database.models.comment import Comment
+from app.database.models.comment import Comment, recount_comment_stats
+from app.database.models.outbox import OutboxEvent, NEWS_CREATED_EVENT
+from app.database.models.refresh_token import RefreshToken
 from datetime import datetime, timedelta
 import logging
 import os
 import json
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -28,6 +38,9 @@ def check_log_directory():
 
 check_log_directory()
 
+def get_task_dedup_key(task_id: str) -> str:
+    return f"task_dedup:{task_id}"
+
 # Класс идемпотентных задач, чтобы уведомления не приходили дважды при различных ошибках
 class IdempotentTask(Task):
     
@@ -40,35 +53,123 @@ class IdempotentTask(Task):
         ):
         # Генерация уникального task_id
         if task_id is None and kwargs:
-            # Используем параметры задачи для генерации уникального ID
-            task_id = f"{self.name}:{hash(json.dumps(kwargs, sort_keys=True))}"
+            # Дайджест параметров одинаков во всех процессах (в отличие от hash())
+            raw = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+            task_id = f"{self.name}:{hashlib.sha256(raw.encode()).hexdigest()}"
         return super().apply_async(args, kwargs, task_id=task_id, **options)
 
+    def __call__(self, *args, **kwargs):
+        # Проверяем только первый запуск: ретраи и повторная доставка после
+        # падения воркера идут с тем же task_id и должны выполниться
+        request = self.request
+        if request.id and not request.retries and not (request.delivery_info or {}).get("redelivered"):
+            try:
+                is_new = redis_client.client.set(
+                    get_task_dedup_key(request.id), 1, nx=True, ex=settings.task_dedup_ttl
+                )
+            except Exception as e:
+                # Redis недоступен — лучше выполнить задачу, чем потерять её
+                logger.error(f"Task dedup check failed for {request.id}: {e}")
+                is_new = True
+            if not is_new:
+                logger.info(f"Duplicate task {request.id} skipped")
+                return None
+        return super().__call__(*args, **kwargs)
+
+    # После исчерпания ретраев ту же задачу можно будет поставить заново
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        try:
+            redis_client.client.delete(get_task_dedup_key(task_id))
+        except Exception as e:
+            logger.error(f"Failed to release dedup key for {task_id}: {e}")
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+
+# Одна компактная NDJSON-запись на пачку; сам текст уведомления лежит под content_key
 def log_notification(
         notification_type: str, 
         recipients: list,
+        content_key: str,
         content: dict,
     ):
-
-    check_log_directory()
-
-    timestamp = datetime.utcnow().isoformat()
-    log_file = NOTIFICATIONS_LOG_DIR / f"{notification_type}_{datetime.utcnow().strftime('%Y%m%d')}.log"
-    
-    log_entry = {
-        "timestamp": timestamp,
+    get_notification_writer(NOTIFICATIONS_LOG_DIR).write({
+        "timestamp": datetime.utcnow().isoformat(),
         "type": notification_type,
+        "subject": content.get("subject"),
+        "content_key": content_key,
+        "count": len(recipients),
         "recipients": recipients,
-        "content": content,
         "status": "sent"
-    }
-    
-    with open(log_file, "a") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+    })
     
     logger.info(f"{notification_type} sent to {len(recipients)} users")
-    for email in recipients:
-        logger.info(f"   to {email}")
+    if settings.notification_log_recipients:
+        for email in recipients:
+            logger.debug(f"   to {email}")
+
+# Email'ы читаются серверным курсором порциями, без загрузки ORM-объектов
+def iter_recipient_batches(db, batch_size: int):
+    result = db.execute(
+        select(User.email)
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in result.scalars().partitions():
+        yield list(batch)
+
+# Текст рассылки (для дайджеста — крупный) кладётся в Redis один раз,
+# а пачки получают только ключ, чтобы не гонять его через брокер в каждой задаче
+NOTIFICATION_CONTENT_TTL = 24 * 60 * 60
+
+def store_notification_content(content: dict) -> str:
+    raw = json.dumps(content, ensure_ascii=False, sort_keys=True)
+    content_key = f"notification:content:{hashlib.sha256(raw.encode()).hexdigest()}"
+    # Без сохранённого текста пачки не отправить — ошибка Redis здесь должна всплыть
+    redis_client.client.set(content_key, raw, ex=NOTIFICATION_CONTENT_TTL)
+    return content_key
+
+@lru_cache(maxsize=8)
+def load_notification_content(content_key: str) -> dict:
+    raw = redis_client.client.get(content_key)
+    if raw is None:
+        raise RuntimeError(f"Notification content {content_key} not found")
+    return json.loads(raw)
+
+# Рассылка разбивается на пачки: каждая — отдельная задача со своими ретраями,
+# поэтому сбой одной пачки не приводит к повторной отправке всем
+def dispatch_notification(notification_type: str, content: dict) -> int:
+    content_key = store_notification_content(content)
+    batches = 0
+    db = SessionLocal()
+    try:
+        for recipients in iter_recipient_batches(db, settings.notification_batch_size):
+            send_notification_batch.apply_async(
+                kwargs={
+                    "notification_type": notification_type,
+                    "recipients": recipients,
+                    "content_key": content_key,
+                }
+            )
+            batches += 1
+    finally:
+        db.close()
+    return batches
+
+@celery_app.task(
+    bind=True,
+    base=IdempotentTask,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=3
+)
+def send_notification_batch(
+    self,
+    notification_type: str,
+    recipients: list,
+    content_key: str,
+):
+    log_notification(notification_type, recipients, content_key, load_notification_content(content_key))
 
 @celery_app.task(
     bind=True,
@@ -88,29 +189,19 @@ def send_new_news_notification(
     try:
         logger.info(f"Processing new news notification: {news_id}")
         
-        db = SessionLocal()
-        try:
-            users = db.query(User).all()
-            
-            if not users:
-                logger.warning("No users found to notify")
-                return
-            
-            recipients = [user.email for user in users]
-            
-            content = {
-                "subject": f"Новая новость: {news_title}",
-                "body": f"Пользователь {author_name} опубликовал новую новость: '{news_title}'.\n\n"
-                        f"Перейти к новости: http://localhost:8000/news/{news_id}",
-                "news_id": news_id
-            }
-            
-            log_notification("new_news", recipients, content)
-            
-            logger.info(f"New news notification sent successfully for news_id={news_id}")
-            
-        finally:
-            db.close()
+        content = {
+            "subject": f"Новая новость: {news_title}",
+            "body": f"Пользователь {author_name} опубликовал новую новость: '{news_title}'.\n\n"
+                    f"Перейти к новости: http://localhost:8000/news/{news_id}",
+            "news_id": news_id
+        }
+        
+        batches = dispatch_notification("new_news", content)
+        if not batches:
+            logger.warning("No users found to notify")
+            return
+        
+        logger.info(f"New news notification for news_id={news_id} queued in {batches} batches")
             
     except Exception as e:
         logger.error(f"Error sending new news notification: {e}")
@@ -131,51 +222,177 @@ def send_weekly_digest(self):
         
         db = SessionLocal()
         try:
-            # Получить новости за последние 7 дней
+            # Одним запросом берём только нужные для дайджеста поля, автор — через JOIN
             week_ago = datetime.utcnow() - timedelta(days=7)
-            news_list = db.query(News).filter(
-                News.publication_date >= week_ago
-            ).order_by(News.publication_date.desc()).all()
-            
-            if not news_list:
-                logger.info("No news published this week")
-                return
-            
-            users = db.query(User).all()
-            
-            if not users:
-                logger.warning("No users found to send digest")
-                return
-            
-            recipients = [user.email for user in users]
-            
-            news_summary = "\n".join([
-                f"- {news.title} (автор: {news.author.name}, {news.publication_date.strftime('%d.%m.%Y')})"
-                for news in news_list
-            ])
-            
-            content = {
-                "subject": f"Еженедельный дайджест новостей ({len(news_list)} новостей)",
-                "body": f"За последнюю неделю было опубликовано {len(news_list)} новостей:\n\n{news_summary}\n\n"
-                        f"Читать все новости: http://localhost:8000/news",
-                "news_count": len(news_list)
-            }
-            
-            log_notification("weekly_digest", recipients, content)
-            
-            logger.info(f"Weekly digest sent successfully ({len(news_list)} news, {len(recipients)} recipients)")
-            
+            news_list = db.execute(
+                select(News.title, User.name, News.publication_date)
+                .join(User, News.author_id == User.id)
+                .where(News.publication_date >= week_ago)
+                .order_by(News.publication_date.desc())
+            ).all()
         finally:
             db.close()
             
+        if not news_list:
+            logger.info("No news published this week")
+            return
+        
+        # Текст дайджеста собирается один раз для всех получателей
+        news_summary = "\n".join([
+            f"- {title} (автор: {author_name}, {publication_date.strftime('%d.%m.%Y')})"
+            for title, author_name, publication_date in news_list
+        ])
+        
+        content = {
+            "subject": f"Еженедельный дайджест новостей ({len(news_list)} новостей)",
+            "body": f"За последнюю неделю было опубликовано {len(news_list)} новостей:\n\n{news_summary}\n\n"
+                    f"Читать все новости: http://localhost:8000/news",
+            "news_count": len(news_list)
+        }
+        
+        batches = dispatch_notification("weekly_digest", content)
+        if not batches:
+            logger.warning("No users found to send digest")
+            return
+        
+        logger.info(f"Weekly digest queued ({len(news_list)} news, {batches} batches)")
+            
     except Exception as e:
         logger.error(f"Error sending weekly digest: {e}")
         raise self.retry(exc=e)
 
+# Какая задача обрабатывает событие из outbox
+OUTBOX_TASKS = {
+    NEWS_CREATED_EVENT: send_new_news_notification,
+}
 
+# Переносит события из outbox в брокер пачками. Строки забираются с SKIP LOCKED,
+# поэтому параллельные запуски не мешают друг другу. Если процесс упадёт между
+# отправкой и коммитом, событие уйдёт повторно — дубль отсечёт IdempotentTask.
+# События неизвестного типа не удаляются, а помечаются failed_at и больше не выбираются
+@celery_app.task
+def relay_outbox_events() -> int:
+    relayed = 0
+    db = SessionLocal()
+    try:
+        while True:
+            events = db.execute(
+                select(OutboxEvent)
+                .where(OutboxEvent.failed_at.is_(None))
+                .order_by(OutboxEvent.id)
+                .limit(settings.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not events:
+                break
+
+            delivered, failed = [], []
+            for event in events:
+                task = OUTBOX_TASKS.get(event.event_type)
+                if task is None:
+                    logger.error(f"Unknown outbox event {event.id}: {event.event_type}")
+                    failed.append(event.id)
+                    continue
+                task.apply_async(kwargs=event.payload)
+                delivered.append(event.id)
+
+            if delivered:
+                db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(delivered)))
+            if failed:
+                db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_(failed))
+                    .values(failed_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            relayed += len(delivered)
+
+            if len(events) < settings.outbox_batch_size:
+                break
+    finally:
+        db.close()
+
+    if relayed:
+        logger.info(f"Relayed {relayed} outbox events")
+    return relayed
 
-from celery.signals import worker_shutdown
+# Заполняет comment_count/last_comment_at для существующих новостей после миграции.
+# Пачки по id, каждая — отдельная короткая транзакция; повторный запуск безопасен
+@celery_app.task
+def backfill_comment_stats(batch_size: int = 1000) -> int:
+    processed = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = db.execute(
+                select(News.id).where(News.id > last_id).order_by(News.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(recount_comment_stats(News.id.in_(ids)))
+            db.commit()
+            processed += len(ids)
+            last_id = ids[-1]
+    finally:
+        db.close()
+
+    logger.info(f"Comment stats backfilled for {processed} news")
+    return processed
+
+@celery_app.task
+def flush_news_views() -> int:
+    db = SessionLocal()
+    try:
+        return flush_views(db)
+    finally:
+        db.close()
+
+@celery_app.task
+def rebuild_trending_news() -> int:
+    db = SessionLocal()
+    try:
+        return rebuild_trending(db)
+    finally:
+        db.close()
+
+# Истёкшие токены (в том числе обменянные и отозванные) больше не нужны даже
+# для обнаружения повторного использования. Пачки ограничены, чтобы не держать
+# долгих блокировок и не раздувать одну транзакцию
+@celery_app.task
+def purge_refresh_tokens(batch_size: int = None) -> int:
+    batch_size = batch_size or settings.refresh_tokens_purge_batch_size
+    now = datetime.utcnow()
+    purged = 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = db.execute(
+                select(RefreshToken.id).where(RefreshToken.expires_at < now).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+            db.commit()
+            purged += len(ids)
+            if len(ids) < batch_size:
+                break
+    finally:
+        db.close()
+
+    logger.info(f"Purged {purged} expired refresh tokens")
+    return purged
+
+
+from celery.signals import worker_shutdown, worker_process_shutdown
 
 @worker_shutdown.connect
 def worker_shutdown_handler(sender, **kwargs):
+    close_notification_writer()
     logger.info("Celery worker shutting down gracefully...")
+
+# Дочерние процессы prefork-пула сбрасывают свой буфер журнала перед выходом
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(**kwargs):
+    close_notification_writer()
@@ -0,0 +1,197 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+import hashlib
+import heapq
+import logging
+import math
+import time
+
+from redis.exceptions import NoScriptError
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app.config import settings
+from app.database.models.comment import Comment
+from app.database.models.news import News
+from app.database.models.user import User
+from app.database.redis_client import redis_client, async_redis_client
+from app.models.news import serialize_news
+
+logger = logging.getLogger(__name__)
+
+# Рейтинг — sorted set с forward decay: событие в момент t добавляет
+# weight * exp((t - epoch) / tau). Более свежие события весят экспоненциально
+# больше, а уже накопленные очки не нужно пересчитывать при каждом чтении.
+# Готовые JSON новостей рейтинга лежат в хэше, так что чтение не идёт в Postgres
+TRENDING_KEY = "trending:news"
+TRENDING_ITEMS_KEY = "trending:items"
+TRENDING_EPOCH_KEY = "trending:epoch"
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# Эпоха читается на стороне Redis, чтобы приращение было одной атомарной командой.
+# Новые участники рейтинга появляются только через add_news/rebuild вместе с JSON
+# новости; просмотры и комментарии лишь увеличивают очки уже присутствующих,
+# иначе верх рейтинга заняли бы id без готовых JSON
+BUMP_SCRIPT = """
+if ARGV[5] ~= '1' and not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return false
+end
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = tonumber(ARGV[3])
+    redis.call('SET', KEYS[2], ARGV[3])
+end
+local score = tonumber(ARGV[2]) * math.exp((tonumber(ARGV[3]) - epoch) / tonumber(ARGV[4]))
+return redis.call('ZINCRBY', KEYS[1], score, ARGV[1])
+"""
+BUMP_SHA = hashlib.sha1(BUMP_SCRIPT.encode()).hexdigest()
+
+def get_decay_tau() -> float:
+    return settings.trending_half_life_hours * 60 * 60 / math.log(2)
+
+# Через EVALSHA: исходник скрипта не отправляется с каждым просмотром
+def queue_bump(pipe, news_id: int, weight: float, now: Optional[float] = None, create: bool = False):
+    pipe.evalsha(
+        BUMP_SHA, 2, TRENDING_KEY, TRENDING_EPOCH_KEY,
+        news_id, weight, now or time.time(), get_decay_tau(), 1 if create else 0,
+    )
+
+# Выполняет пачку с приращениями из queue_bump. После перезапуска Redis кэш
+# скриптов пуст: тогда скрипт загружается и повторяются только приращения —
+# остальные команды пачки уже выполнены и второй раз применяться не должны
+async def execute_with_bumps(pipe, client) -> list:
+    commands = [args for args, _ in pipe.command_stack]
+    results = await pipe.execute(raise_on_error=False)
+    missing = [i for i, result in enumerate(results) if isinstance(result, NoScriptError)]
+    if missing:
+        await client.script_load(BUMP_SCRIPT)
+        for i in missing:
+            results[i] = await client.execute_command(*commands[i])
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+
+async def bump(news_id: int, weight: float):
+    client = async_redis_client.client
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            queue_bump(pipe, news_id, weight)
+            await execute_with_bumps(pipe, client)
+    except Exception as e:
+        logger.error(f"Failed to bump trending score for news {news_id}: {e}")
+
+async def add_news(news_id: int, payload: bytes):
+    client = async_redis_client.binary_client
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            queue_bump(pipe, news_id, settings.trending_news_weight, create=True)
+            pipe.hset(TRENDING_ITEMS_KEY, news_id, payload)
+            await execute_with_bumps(pipe, client)
+    except Exception as e:
+        logger.error(f"Failed to add news {news_id} to trending: {e}")
+
+# Новость могла и не попасть в рейтинг — тогда запись в хэше проживёт до пересборки
+async def update_news(news_id: int, payload: bytes):
+    try:
+        await async_redis_client.binary_client.hset(TRENDING_ITEMS_KEY, news_id, payload)
+    except Exception as e:
+        logger.error(f"Failed to update trending news {news_id}: {e}")
+
+async def remove_news(news_ids: Iterable[int]):
+    news_ids = list(news_ids)
+    if not news_ids:
+        return
+    try:
+        async with async_redis_client.binary_client.pipeline(transaction=False) as pipe:
+            pipe.zrem(TRENDING_KEY, *news_ids)
+            pipe.hdel(TRENDING_ITEMS_KEY, *news_ids)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to remove news from trending: {e}")
+
+
+# O(log N + k): верхушка sorted set'а и готовые JSON из хэша
+async def get_trending(limit: int) -> bytes:
+    client = async_redis_client.binary_client
+    news_ids = await client.zrevrange(TRENDING_KEY, 0, limit - 1)
+    if not news_ids:
+        return b"[]"
+    payloads = await client.hmget(TRENDING_ITEMS_KEY, news_ids)
+    return b"[" + b",".join(payload for payload in payloads if payload) + b"]"
+
+
+# Полный пересчёт по Postgres и почасовым счётчикам просмотров: исправляет
+# дрейф (потерянные приращения, устаревшие JSON) и сдвигает эпоху к текущему
+# моменту, чтобы экспонента не росла неограниченно
+def rebuild_trending(db) -> int:
+    # news_views сам ставит приращения рейтинга, поэтому импорт здесь, а не наверху
+    from app.news_views import get_views_hour_key
+
+    now = time.time()
+    tau = get_decay_tau()
+    since = datetime.utcnow() - timedelta(days=settings.trending_window_days)
+
+    def decay(moment: datetime) -> float:
+        # Даты в БД — naive UTC
+        return math.exp(((moment - UNIX_EPOCH).total_seconds() - now) / tau)
+
+    scores = {}
+    for news_id, publication_date in db.execute(
+        select(News.id, News.publication_date).where(News.publication_date >= since)
+    ):
+        scores[news_id] = settings.trending_news_weight * decay(publication_date)
+
+    comments = db.execute(
+        select(Comment.news_id, Comment.publication_date)
+        .where(Comment.publication_date >= since)
+        .execution_options(yield_per=10000)
+    )
+    for news_id, publication_date in comments:
+        if news_id in scores:
+            scores[news_id] += settings.trending_comment_weight * decay(publication_date)
+
+    # Просмотры известны с точностью до часа — считаем их в середине часа
+    client = redis_client.binary_client
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    hours = min(settings.trending_window_days * 24, settings.news_views_max_hours)
+    for i in range(hours):
+        hour_start = hour - timedelta(hours=i)
+        weight = settings.trending_view_weight * decay(hour_start + timedelta(minutes=30))
+        for news_id, views in client.zrange(get_views_hour_key(hour_start), 0, -1, withscores=True):
+            news_id = int(news_id)
+            if news_id in scores:
+                scores[news_id] += weight * views
+
+    top = heapq.nlargest(settings.trending_size, scores.items(), key=lambda item: item[1])
+
+    payloads = {}
+    if top:
+        for news in db.execute(
+            select(News)
+            .options(joinedload(News.author, innerjoin=True).load_only(User.id, User.name))
+            .where(News.id.in_([news_id for news_id, _ in top]))
+        ).scalars():
+            payloads[news.id] = serialize_news(news, news.author.id, news.author.name)
+
+    # Новый рейтинг собирается во временных ключах и подменяет старый атомарно
+    next_key, next_items_key = f"{TRENDING_KEY}:next", f"{TRENDING_ITEMS_KEY}:next"
+    with client.pipeline(transaction=False) as pipe:
+        pipe.delete(next_key, next_items_key)
+        if payloads:
+            pipe.zadd(next_key, {news_id: score for news_id, score in top if news_id in payloads})
+            pipe.hset(next_items_key, mapping=payloads)
+        pipe.execute()
+
+    with client.pipeline(transaction=True) as pipe:
+        if payloads:
+            pipe.rename(next_key, TRENDING_KEY)
+            pipe.rename(next_items_key, TRENDING_ITEMS_KEY)
+        else:
+            pipe.delete(TRENDING_KEY, TRENDING_ITEMS_KEY)
+        pipe.set(TRENDING_EPOCH_KEY, now)
+        pipe.execute()
+
+    logger.info(f"Trending rebuilt: {len(payloads)} news")
+    return len(payloads)
@@ -0,0 +1,92 @@
+"""Накладные расходы авторизации на запрос: get_current_user до и после.
+
+old — токен без name/ver: проверка token_version, затем кэшированный словарь
+      пользователя -> ORM-объект User.
+new — токен с name/ver: проверка token_version -> TokenUser из claims.
+
+По умолчанию Redis подменяется локальным LRU (LocalCache) — так измеряется
+только CPU-часть, как при попадании в кэш процесса. С --redis используется
+настоящий async_redis_client (нужен поднятый Redis, например docker-compose up),
+и в обе цифры входит сетевой путь до Redis при промахе локального уровня.
+
+Запуск из папки backend:
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --redis
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+from starlette.requests import Request
+
+from app.auth import utils
+from app.database.models.news import News  # noqa: F401 — нужна для связей User
+from app.database.models.comment import Comment  # noqa: F401
+from app.database.models.user import User
+from app.database.redis_client import _MISSING, LocalCache, async_redis_client
+
+ITERATIONS = 20000
+
+
+class LocalOnlyRedis:
+    def __init__(self):
+        self.cache = LocalCache({"user:": 1000, "token_version:": 1000}, ttl=3600)
+
+    async def get(self, key):
+        value = self.cache.get(key)
+        return None if value is _MISSING else value
+
+    async def set(self, key, value, ttl=300):
+        self.cache.set(key, value, ttl)
+
+    async def add(self, key, value, ttl=300):
+        if self.cache.get(key) is not _MISSING:
+            return False
+        self.cache.set(key, value, ttl)
+        return True
+
+
+def make_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def measure(request: Request) -> float:
+    # Первый вызов прогревает кэш
+    await utils.get_current_user(request, None)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await utils.get_current_user(request, None)
+    return (time.perf_counter() - start) / ITERATIONS * 1_000_000
+
+
+async def run(redis):
+    user = User(
+        id=1, name="author", email="author@test.com", avatar=None,
+        is_admin=False, is_verified=True, token_version=0,
+    )
+    old_token = utils.create_access_token(user.id, user.is_admin, user.is_verified)
+    new_token = utils.create_user_access_token(user)
+
+    with patch.object(utils, "async_redis_client", redis):
+        await utils.cache_user(user)
+        await redis.set(utils.get_token_version_key(user.id), 0, ttl=3600)
+
+        old = await measure(make_request(old_token))
+        new = await measure(make_request(new_token))
+
+    print(f"{'path':>5} {'us/request':>11}")
+    print(f"{'old':>5} {old:>11.1f}")
+    print(f"{'new':>5} {new:>11.1f}")
+    print(f"speedup: {old / new:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis", action="store_true", help="использовать настоящий Redis")
+    args = parser.parse_args()
+    asyncio.run(run(async_redis_client if args.redis else LocalOnlyRedis()))
+
+
+if __name__ == "__main__":
+    main()
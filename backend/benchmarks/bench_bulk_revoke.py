@@ -0,0 +1,113 @@
+"""Стоимость массового отзыва сессий в зависимости от общего числа сессий.
+
+База наполняется --sessions сессиями (по --per-user на пользователя), затем
+revoke_user_sessions вызывается для 1, 10 и 100 пользователей. Время и число
+удалённых ключей Redis должны зависеть от числа затронутых сессий, а не от
+общего размера refresh_tokens. Redis подменён заглушкой, которая считает ключи.
+
+По умолчанию база — SQLite-файл; для замера на Postgres задайте DATABASE_URL.
+
+Запуск из папки backend:
+    python -m benchmarks.bench_bulk_revoke --sessions 1000000
+"""
+import argparse
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_bulk_revoke.db")
+
+from sqlalchemy import func, insert, select, update  # noqa: E402
+
+from app.auth import sessions  # noqa: E402
+from app.database.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.database.models.news import News  # noqa: E402,F401
+from app.database.models.comment import Comment  # noqa: E402,F401
+from app.database.models.refresh_token import RefreshToken  # noqa: E402
+from app.database.models.user import User  # noqa: E402
+
+CHUNK = 50_000
+
+
+class CountingRedis:
+    def __init__(self):
+        self.deleted = 0
+        self.pipe = MagicMock()
+        self.pipe.delete.side_effect = lambda *keys: setattr(self, "deleted", self.deleted + len(keys))
+
+        async def execute():
+            return [[] for _ in range(self.pipe.zrange.call_count)]
+        self.pipe.execute = execute
+
+    @asynccontextmanager
+    async def pipeline(self, transaction=True, binary=False):
+        self.pipe.zrange.reset_mock()
+        yield self.pipe
+
+
+def seed(total: int, per_user: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Сессии, отозванные прошлым запуском, снова активны
+        conn.execute(update(RefreshToken).where(RefreshToken.revoked_at.is_not(None)).values(revoked_at=None))
+        existing = conn.execute(select(func.count()).select_from(RefreshToken)).scalar()
+        if existing >= total:
+            return
+        users = total // per_user
+        first_id = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+        print(f"seeding {users} users / {total} sessions...")
+        for start in range(0, users, CHUNK):
+            conn.execute(insert(User), [
+                {"id": first_id + i, "name": f"bench{first_id + i}", "email": f"bench{first_id + i}@test.com"}
+                for i in range(start, min(start + CHUNK, users))
+            ])
+        expires_at = datetime.utcnow() + timedelta(days=21)
+        rows = []
+        for i in range(users):
+            for j in range(per_user):
+                rows.append({
+                    "user_id": first_id + i, "token_hash": f"{first_id + i}-{j}",
+                    "family_id": f"{first_id + i}-{j}", "expires_at": expires_at,
+                })
+            if len(rows) >= CHUNK:
+                conn.execute(insert(RefreshToken), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(RefreshToken), rows)
+
+
+async def measure(user_ids):
+    redis = CountingRedis()
+    with patch.object(sessions, "async_redis_client", redis):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            revoked = await sessions.revoke_user_sessions(db, user_ids)
+            elapsed = (time.perf_counter() - start) * 1000
+    return revoked, redis.deleted, elapsed
+
+
+async def main(total: int, per_user: int):
+    seed(total, per_user)
+    async with AsyncSessionLocal() as db:
+        user_ids = (await db.execute(
+            select(RefreshToken.user_id).where(RefreshToken.revoked_at.is_(None)).distinct().limit(111)
+        )).scalars().all()
+
+    print(f"total sessions: {total}")
+    print(f"{'users':>6} {'revoked':>8} {'redis keys':>11} {'ms':>8}")
+    offset = 0
+    for count in (1, 10, 100):
+        revoked, deleted, elapsed = await measure(user_ids[offset:offset + count])
+        offset += count
+        print(f"{count:>6} {revoked:>8} {deleted:>11} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--per-user", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.per_user))
@@ -0,0 +1,63 @@
+"""Стоимость decode_token: jwt.decode на каждый запрос против кэша в воркере.
+
+Для HS256, EdDSA и ES256 печатается время проверки токена:
+  pem     — jwt.decode с ключом в виде PEM/строки (ключ разбирается на каждый вызов);
+  parsed  — jwt.decode с заранее разобранным ключом (как после load_signing_keys);
+  cached  — decode_token: повторная проверка того же токена через кэш воркера.
+
+Запуск из папки backend:
+    python -m benchmarks.bench_jwt_decode
+"""
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import get_default_algorithms
+
+from app.auth import utils
+
+ITERATIONS = 20000
+SECRET = "x" * 32
+
+
+def make_keys(algorithm: str):
+    if algorithm == "HS256":
+        return SECRET, SECRET, SECRET
+    private_key = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_key, public_pem, get_default_algorithms()[algorithm].prepare_key(public_pem)
+
+
+def per_call_us(fn, iterations: int = ITERATIONS) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main():
+    payload = {
+        "sub": "42", "exp": datetime.utcnow() + timedelta(minutes=15),
+        "admin": False, "verified": True, "name": "author", "ver": 3,
+    }
+    print(f"{'algorithm':>9} {'pem, us':>9} {'parsed, us':>11} {'cached, us':>11}")
+    for algorithm in ("HS256", "EdDSA", "ES256"):
+        signing_key, pem, parsed = make_keys(algorithm)
+        token = jwt.encode(payload, signing_key, algorithm=algorithm)
+
+        pem_us = per_call_us(lambda: jwt.decode(token, pem, algorithms=[algorithm]))
+        parsed_us = per_call_us(lambda: jwt.decode(token, parsed, algorithms=[algorithm]))
+        with patch.object(utils, "VERIFY_KEY", parsed), patch.object(utils, "ALGORITHM", algorithm), \
+             patch.object(utils, "decoded_tokens", utils.DecodedTokenCache(10000)):
+            cached_us = per_call_us(lambda: utils.decode_token(token))
+        print(f"{algorithm:>9} {pem_us:>9.1f} {parsed_us:>11.1f} {cached_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
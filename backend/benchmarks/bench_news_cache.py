@@ -0,0 +1,71 @@
+"""Сравнение CPU на запрос при отдаче новости из кэша.
+
+old — как было: json.loads -> NewsResponse(**data) -> повторная валидация
+      по response_model -> jsonable_encoder -> JSONResponse.
+new — готовые байты из Redis отдаются как Response без разбора.
+
+Запуск из папки backend:
+    python -m benchmarks.bench_news_cache
+"""
+import json
+import time
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.models.news import NewsResponse
+
+ITERATIONS = 5000
+
+
+def make_news(paragraphs: int) -> dict:
+    return {
+        "id": 1,
+        "title": "Новая новость",
+        "content": {
+            "text": "Текст новости. " * 20,
+            "blocks": [
+                {"type": "paragraph", "data": {"text": f"Абзац {i}. " + "слово " * 50}}
+                for i in range(paragraphs)
+            ],
+        },
+        "cover": None,
+        "author_id": 1,
+        "publication_date": datetime.utcnow(),
+        "author": {"id": 1, "name": "author"},
+    }
+
+
+def old_path(cached: str) -> bytes:
+    news = NewsResponse(**json.loads(cached))
+    validated = NewsResponse.model_validate(news)
+    return JSONResponse(content=jsonable_encoder(validated)).body
+
+
+def new_path(cached: bytes) -> bytes:
+    return Response(content=cached, media_type="application/json").body
+
+
+def measure(func, payload) -> float:
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        func(payload)
+    return (time.process_time() - start) / ITERATIONS * 1_000_000
+
+
+def main():
+    print(f"{'paragraphs':>10} {'size, KB':>9} {'old, us':>9} {'new, us':>9} {'speedup':>8}")
+    for paragraphs in (1, 10, 100):
+        news = make_news(paragraphs)
+        as_str = json.dumps(news, default=str)
+        as_bytes = orjson.dumps(news)
+
+        old = measure(old_path, as_str)
+        new = measure(new_path, as_bytes)
+        print(f"{paragraphs:>10} {len(as_bytes) / 1024:>9.1f} {old:>9.1f} {new:>9.1f} {old / new:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Пропускная способность логина (argon2 verify) в зависимости от числа процессов пула.
+
+Параметры argon2 берутся из Settings (ARGON2_TIME_COST, ARGON2_MEMORY_COST,
+ARGON2_PARALLELISM). Запуск из папки backend:
+    python -m benchmarks.bench_password_hashing --logins 64 --workers 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.auth.passwords import _hash, _verify  # noqa: E402
+from app.config import settings  # noqa: E402
+
+PASSWORD = "StrongPassword1!"
+
+
+def measure(workers: int, logins: int, hashed: str) -> float:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Прогрев: процессы стартуют и импортируют модуль до замера
+        list(executor.map(_verify, [PASSWORD] * workers, [hashed] * workers))
+        start = time.perf_counter()
+        results = list(executor.map(_verify, [PASSWORD] * logins, [hashed] * logins))
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    print(f"argon2: time_cost={settings.argon2_time_cost} "
+          f"memory_cost={settings.argon2_memory_cost}KiB parallelism={settings.argon2_parallelism}, "
+          f"cpu_count={os.cpu_count()}")
+    hashed = _hash(PASSWORD)
+    print(f"{'workers':>8} {'logins/sec':>11}")
+    for workers in sorted(set(args.workers)):
+        print(f"{workers:>8} {measure(workers, args.logins, hashed):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
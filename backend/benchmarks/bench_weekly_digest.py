@@ -0,0 +1,114 @@
+"""Время и пиковая память (RSS) сборки еженедельного дайджеста.
+
+old — как было: ORM-объекты News целиком (с JSON content), автор каждой
+      новости отдельным запросом, все User в памяти одним списком.
+new — send_weekly_digest: один запрос с JOIN по нужным полям, получатели
+      читаются пачками, постановка задач в брокер подменена заглушкой.
+
+Каждый вариант запускается в отдельном процессе, чтобы пиковый RSS не
+смешивался с наполнением базы. По умолчанию база — SQLite-файл; для замера
+на Postgres задайте DATABASE_URL (таблицы должны быть пустыми или уже
+наполненными этим скриптом).
+
+Запуск из папки backend:
+    python -m benchmarks.bench_weekly_digest --news 10000 --users 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_weekly_digest.db")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.database.database import Base, SessionLocal, engine  # noqa: E402
+from app.database.models.news import News  # noqa: E402
+from app.database.models.user import User  # noqa: E402
+from app.database.models.comment import Comment  # noqa: E402,F401
+from app import tasks  # noqa: E402
+
+CHUNK = 50_000
+
+
+def seed(news_count: int, users_count: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(User)).scalar() >= users_count:
+            return
+        print(f"seeding {users_count} users and {news_count} news...")
+        for start in range(0, users_count, CHUNK):
+            conn.execute(insert(User), [
+                {"name": f"user{i}", "email": f"user{i}@test.com"}
+                for i in range(start, min(start + CHUNK, users_count))
+            ])
+        now = datetime.utcnow()
+        content = {"blocks": [{"type": "paragraph", "data": {"text": "слово " * 200}}] * 3}
+        conn.execute(insert(News), [
+            {
+                "title": f"Новость {i}",
+                "content": content,
+                "author_id": i % 1000 + 1,
+                "publication_date": now - timedelta(minutes=i),
+            }
+            for i in range(news_count)
+        ])
+
+
+def old_digest():
+    db = SessionLocal()
+    try:
+        week_ago = datetime.utcnow() - timedelta(days=7)
+        news_list = db.query(News).filter(News.publication_date >= week_ago).all()
+        recipients = [user.email for user in db.query(User).all()]
+        news_summary = "\n".join([
+            f"- {news.title} (автор: {news.author.name}, {news.publication_date.strftime('%d.%m.%Y')})"
+            for news in news_list
+        ])
+        return len(recipients), len(news_summary)
+    finally:
+        db.close()
+
+
+def new_digest():
+    with patch.object(tasks, "redis_client"), \
+         patch.object(tasks.send_notification_batch, "apply_async") as apply_async:
+        tasks.send_weekly_digest.run()
+    return apply_async.call_count
+
+
+def run(mode: str):
+    start = time.perf_counter()
+    result = old_digest() if mode == "old" else new_digest()
+    elapsed = time.perf_counter() - start
+    # ru_maxrss в Linux — в килобайтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:>4} {elapsed:>9.2f} {peak:>13.1f}   ({result})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--news", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--run", choices=["old", "new"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run)
+        return
+
+    seed(args.news, args.users)
+    print(f"{'mode':>4} {'time, s':>9} {'peak RSS, MB':>13}")
+    for mode in ("old", "new"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_weekly_digest", "--run", mode],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
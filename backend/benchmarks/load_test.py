@@ -0,0 +1,74 @@
+"""Нагрузочный тест: requests/sec и перцентили задержки при высокой конкурентности.
+
+Запускается против поднятого стека (docker-compose up), например для сравнения
+sync- и async-версий обработчиков: один прогон на коммите до перехода на async,
+второй — после, с одинаковыми параметрами и числом воркеров uvicorn.
+
+    python -m benchmarks.load_test --url http://localhost:8000 --path /news/1 \
+        --concurrency 500 --requests 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, path: str, queue: asyncio.Queue, latencies: list, errors: list):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: list, p: float) -> float:
+    return statistics.quantiles(values, n=100)[int(p) - 1] if len(values) > 1 else values[0]
+
+
+async def run(url: str, path: str, concurrency: int, total: int):
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    latencies: list = []
+    errors: list = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, path, queue, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    print(f"{path}: {total} requests, concurrency {concurrency}")
+    print(f"  requests/sec: {total / elapsed:.1f}")
+    print(f"  p50: {percentile(latencies, 50) * 1000:.1f}ms  "
+          f"p99: {percentile(latencies, 99) * 1000:.1f}ms  "
+          f"max: {max(latencies) * 1000:.1f}ms")
+    print(f"  errors: {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", help="можно указать несколько раз")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    for path in args.path or ["/news/", "/news/1"]:
+        asyncio.run(run(args.url, path, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.database.database import Base
+
+
+# Настоящая БД (файл SQLite) для тестов, которым важны сами SQL-запросы.
+# Данные готовим синхронной сессией, приложение читает их через aiosqlite
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return tmp_path / "test.db"
+
+
+@pytest.fixture
+def sqlite_engine(sqlite_path):
+    engine = create_engine(f"sqlite:///{sqlite_path}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_db(sqlite_engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def async_sqlite_engine(sqlite_engine, sqlite_path):
+    # NullPool: TestClient крутит приложение в своём event loop, соединения между loop'ами не переносим
+    engine = create_async_engine(f"sqlite+aiosqlite:///{sqlite_path}", poolclass=NullPool)
+    yield engine
+
+
+@pytest.fixture
+def override_get_async_db(async_sqlite_engine):
+    session_factory = async_sessionmaker(async_sqlite_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    return get_async_db
+
+
+# Счётчик SQL-запросов, отправленных в БД: и приложением (aiosqlite),
+# и синхронной сессией (задачи Celery, sqlite_db)
+@pytest.fixture
+def query_counter(sqlite_engine, async_sqlite_engine):
+    statements = []
+    engines = [sqlite_engine, async_sqlite_engine.sync_engine]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -1,15 +1,18 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from app.main import app
-from app.database.database import get_db
+from app.database.database import get_async_db
 from app.database.models.user import User
 
 client = TestClient(app)
 
 @pytest.fixture
 def mock_db():
-    return MagicMock()
+    db = AsyncMock()
+    db.add = MagicMock()
+    return db
 
 @pytest.fixture
 def override_get_db(mock_db):
@@ -20,29 +23,35 @@ def override_get_db(mock_db):
 
 @pytest.fixture(autouse=True)
 def dependency_override(override_get_db):
-    app.dependency_overrides[get_db] = lambda: override_get_db
+    app.dependency_overrides[get_async_db] = lambda: override_get_db
     yield
     app.dependency_overrides = {}
 
 @pytest.fixture(autouse=True)
 def mock_external_deps():
-    with patch("app.handlers.auth.redis_client"), \
+    with patch("app.auth.sessions.async_redis_client", new_callable=AsyncMock) as mock_redis, \
          patch("app.handlers.auth.get_password_hash", return_value="hashed"), \
          patch("app.handlers.auth.verify_password", return_value=True), \
          patch("app.handlers.auth.cache_user"):
-        yield
+        # Команды пайплайна буферизуются синхронно, отправляет их только execute()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[])
+        mock_redis.client.pipeline = MagicMock()
+        mock_redis.client.pipeline.return_value.__aenter__.return_value = pipe
+        mock_redis.pipeline = MagicMock()
+        mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+        yield mock_redis
 
-# --- Вспомогательная функция настройки мока Query ---
+# --- Вспомогательная функция настройки мока результата запроса ---
 def setup_mock_query(mock_db, first_return_value):
-    mock_query = MagicMock()
-    mock_db.query.return_value = mock_query
-    mock_query.filter.return_value = mock_query
+    mock_result = MagicMock()
+    mock_db.execute.return_value = mock_result
     
     if isinstance(first_return_value, list):
-        mock_query.first.side_effect = first_return_value
+        mock_result.scalar_one_or_none.side_effect = first_return_value
     else:
-        mock_query.first.return_value = first_return_value
-    return mock_query
+        mock_result.scalar_one_or_none.return_value = first_return_value
+    return mock_result
 
 # ----------------- TESTS -----------------
 
@@ -119,7 +128,225 @@ def test_register_validation_error():
     response = client.post("/auth/register", json=payload)
     assert response.status_code == 422
 
-def test_logout_success():
-    payload = {"refresh_token": "token"}
-    response = client.post("/auth/logout", json=payload)
-    assert response.status_code == 200
+def test_password_hash_pool_saturated_returns_503():
+    from fastapi import HTTPException
+    from app.auth import passwords
+    with patch.object(passwords.settings, "password_hash_max_pending", 0):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(passwords.get_password_hash("StrongPassword1!"))
+    assert exc.value.status_code == 503
+
+def test_broken_hash_pool_returns_503_and_is_recreated():
+    from concurrent.futures.process import BrokenProcessPool
+    from fastapi import HTTPException
+    from app.auth import passwords
+
+    broken = MagicMock()
+    broken.submit.side_effect = BrokenProcessPool("child killed")
+    with patch.object(passwords, "_executor", broken):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(passwords.get_password_hash("StrongPassword1!"))
+        assert passwords._executor is None
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+    broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+    assert passwords._pending == 0
+
+def test_register_returns_503_when_hash_pool_saturated(mock_db):
+    from app.auth import passwords
+    setup_mock_query(mock_db, None)
+    payload = {"name": "newuser", "email": "new@test.com", "password": "StrongPassword1!"}
+
+    with patch("app.handlers.auth.get_password_hash", passwords.get_password_hash), \
+         patch.object(passwords.settings, "password_hash_max_pending", 0):
+        response = client.post("/auth/register", json=payload)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    mock_db.commit.assert_not_called()
+
+# --- Вспомогательная функция: запрос с access-токеном пользователя ---
+def make_request(user):
+    from starlette.requests import Request
+    from app.auth.utils import create_user_access_token
+
+    token = create_user_access_token(user)
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+def test_current_user_from_token_claims(mock_db):
+    from app.auth import utils
+
+    request = make_request(User(id=1, name="author", is_admin=False, is_verified=True, token_version=3))
+
+    with patch.object(utils, "async_redis_client", new_callable=AsyncMock) as redis:
+        redis.get.return_value = 3
+        user = asyncio.run(utils.get_current_user(request, mock_db))
+
+    assert (user.id, user.name, user.is_admin, user.is_verified) == (1, "author", False, True)
+    redis.get.assert_awaited_once_with("token_version:1")
+    mock_db.execute.assert_not_called()
+
+def test_revoked_token_is_rejected(mock_db):
+    from fastapi import HTTPException
+    from app.auth import utils
+
+    request = make_request(User(id=1, name="author", is_admin=True, is_verified=True, token_version=1))
+
+    with patch.object(utils, "async_redis_client", new_callable=AsyncMock) as redis:
+        redis.get.return_value = 2
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(utils.get_current_user(request, mock_db))
+
+    assert exc.value.detail == "Token revoked"
+
+@pytest.mark.parametrize("stateless, with_claims", [(False, True), (True, False)])
+def test_revoked_token_is_rejected_on_every_path(mock_db, stateless, with_claims):
+    from fastapi import HTTPException
+    from starlette.requests import Request
+    from app.auth import utils
+
+    if with_claims:
+        token = utils.create_user_access_token(User(id=1, name="author", is_admin=False, is_verified=True, token_version=0))
+    else:
+        # Токен без name/ver — выдан до появления версии
+        token = utils.create_access_token(1, is_verified=True)
+    request = Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+    with patch.object(utils, "async_redis_client", new_callable=AsyncMock) as redis, \
+         patch.object(utils.settings, "auth_stateless", stateless):
+        redis.get.return_value = 1
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(utils.get_current_user(request, mock_db))
+
+    assert exc.value.detail == "Token revoked"
+    mock_db.execute.assert_not_called()
+
+def test_token_version_falls_back_to_db(mock_db):
+    from app.auth import utils
+
+    setup_mock_query(mock_db, 0)
+    request = make_request(User(id=1, name="author", is_admin=False, is_verified=False, token_version=0))
+
+    with patch.object(utils, "async_redis_client", new_callable=AsyncMock) as redis:
+        redis.get.return_value = None
+        user = asyncio.run(utils.get_current_user(request, mock_db))
+
+    assert user.id == 1
+    redis.add.assert_awaited_once_with("token_version:1", 0, ttl=utils.TOKEN_VERSION_TTL)
+
+# --- Вспомогательный класс: строки Redis в словаре (SET NX, SETEX в пайплайне) ---
+class DictRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def setex(self, key, ttl, value):
+                self.commands.append((key, value))
+
+            async def execute(self):
+                for key, value in self.commands:
+                    await redis.set(key, value)
+
+        return Pipeline()
+
+def test_token_version_fill_does_not_overwrite_concurrent_revoke():
+    from app.auth import utils
+
+    revoke_db = AsyncMock()
+    revoke_db.execute.return_value.all = MagicMock(return_value=[(1, 1)])
+    fill_db = AsyncMock()
+
+    # Пока заполнение читает из БД старую версию, отзыв успевает записать новую
+    async def read_stale_version(*args, **kwargs):
+        await utils.revoke_users_tokens([1], revoke_db)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = 0
+        return result
+
+    fill_db.execute.side_effect = read_stale_version
+
+    async def scenario():
+        await utils.get_token_version(1, fill_db)
+        return await utils.get_token_version(1, fill_db)
+
+    with patch.object(utils.async_redis_client, "client", DictRedis()), \
+         patch.object(utils.async_redis_client, "local", None):
+        assert asyncio.run(scenario()) == 1
+    assert fill_db.execute.await_count == 1
+
+def test_decode_token_is_cached():
+    import jwt
+    from app.auth import utils
+
+    token = utils.create_access_token(7, is_verified=True)
+
+    with patch.object(utils.jwt, "decode", wraps=jwt.decode) as decode:
+        first = utils.decode_token(token)
+        first["sub"] = "changed"
+        second = utils.decode_token(token)
+
+    decode.assert_called_once()
+    assert second["sub"] == "7"
+
+def test_expired_cached_token_is_rejected():
+    from fastapi import HTTPException
+    from app.auth import utils
+
+    token = utils.create_access_token(8)
+    payload = utils.decode_token(token)
+
+    with patch.object(utils.time, "time", return_value=payload["exp"] + 1), \
+         patch.object(utils.jwt, "decode", side_effect=utils.jwt.ExpiredSignatureError) as decode:
+        with pytest.raises(HTTPException):
+            utils.decode_token(token)
+
+    decode.assert_called_once()
+
+@pytest.mark.parametrize("algorithm", ["EdDSA", "ES256"])
+def test_asymmetric_keys_verify_with_public_key_only(tmp_path, algorithm):
+    import jwt
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    from app.auth import utils
+
+    private_key = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    private_path, public_path = tmp_path / "private.pem", tmp_path / "public.pem"
+    private_path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ))
+    public_path.write_bytes(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+
+    signing_key, _ = utils.load_signing_keys(algorithm, "unused", private_key_path=str(private_path))
+    token = jwt.encode({"sub": "1"}, signing_key, algorithm=algorithm)
+
+    # Edge-сервису хватает публичного ключа
+    no_signing_key, verify_key = utils.load_signing_keys(algorithm, "unused", public_key_path=str(public_path))
+    assert no_signing_key is None
+    assert jwt.decode(token, verify_key, algorithms=[algorithm])["sub"] == "1"
+
+    with pytest.raises(ValueError):
+        utils.load_signing_keys(algorithm, "unused")
@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+from app.main import app
+from app.database.database import get_async_db
+from app.database.models.user import User
+from app.database.models.news import News
+from app.database.models.comment import Comment
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def dependency_override(override_get_async_db):
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides = {}
+
+@pytest.fixture(autouse=True)
+def mock_redis():
+    with patch("app.handlers.comment.async_redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("app.handlers.comment.trending", new_callable=AsyncMock):
+        yield mock_redis
+
+# --- Вспомогательная функция: новость и n комментариев от n разных авторов ---
+def create_comments(db, count):
+    news_author = User(name="news_author", email="news_author@test.com")
+    db.add(news_author)
+    db.flush()
+    news = News(title="news", content={"text": "text"}, author_id=news_author.id)
+    db.add(news)
+    db.flush()
+    for i in range(count):
+        author = User(name=f"commenter{i}", email=f"commenter{i}@test.com")
+        db.add(author)
+        db.flush()
+        db.add(Comment(text=f"comment {i}", news_id=news.id, author_id=author.id))
+    db.commit()
+    return news.id
+
+# ----------------- TESTS -----------------
+
+@pytest.mark.parametrize("count", [1, 5, 20])
+def test_get_comments_query_count_is_constant(sqlite_db, query_counter, count):
+    news_id = create_comments(sqlite_db, count)
+    query_counter.clear()
+
+    response = client.get("/comments/", params={"news_id": news_id})
+
+    assert response.status_code == 200
+    assert len(response.json()) == count
+    assert response.json()[0]["author"]["name"].startswith("commenter")
+    assert len(query_counter) == 1
+
+def test_get_news_comments_pagination(sqlite_db):
+    news_id = create_comments(sqlite_db, 5)
+
+    first = client.get(f"/news/{news_id}/comments", params={"limit": 3}).json()
+    second = client.get(f"/news/{news_id}/comments", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    texts = [item["text"] for item in first["items"] + second["items"]]
+    assert texts == [f"comment {i}" for i in range(5)]
+    assert second["next_cursor"] is None
+
+def test_get_news_comments_not_found(sqlite_db):
+    response = client.get("/news/999/comments")
+    assert response.status_code == 404
+
+def test_get_comments_is_capped(sqlite_db):
+    create_comments(sqlite_db, 5)
+
+    response = client.get("/comments/", params={"limit": 2})
+
+    assert [item["text"] for item in response.json()] == ["comment 4", "comment 3"]
+    assert client.get("/comments/", params={"limit": 10000}).status_code == 422
+
+def test_get_comments_by_news_is_not_truncated(sqlite_db):
+    news_id = create_comments(sqlite_db, 5)
+
+    response = client.get("/comments/", params={"news_id": news_id})
+
+    assert [item["text"] for item in response.json()] == [f"comment {i}" for i in range(5)]
+    assert response.headers["Link"] == f'</news/{news_id}/comments>; rel="successor-version"'
+    # Явно переданный limit соблюдается
+    response = client.get("/comments/", params={"news_id": news_id, "limit": 2})
+    assert [item["text"] for item in response.json()] == ["comment 0", "comment 1"]
+
+@patch("app.handlers.news.record_view", new_callable=AsyncMock)
+@patch("app.handlers.news.async_redis_client", new_callable=AsyncMock)
+def test_comment_stats_are_maintained(news_redis, record_view, sqlite_db, mock_redis):
+    news_redis.get_raw.return_value = None
+    from app.auth.utils import get_current_user
+
+    news_id = create_comments(sqlite_db, 0)
+    author = sqlite_db.query(User).first()
+    app.dependency_overrides[get_current_user] = lambda: author
+
+    first = client.post("/comments/", json={"news_id": news_id, "text": "first"}).json()
+    second = client.post("/comments/", json={"news_id": news_id, "text": "second"}).json()
+
+    news = client.get(f"/news/{news_id}").json()
+    assert news["comment_count"] == 2
+    assert news["last_comment_at"] == second["publication_date"]
+
+    app.dependency_overrides[get_current_user] = lambda: User(id=author.id, is_admin=True)
+    assert client.delete(f"/comments/{second['id']}").status_code == 200
+
+    news = client.get(f"/news/{news_id}").json()
+    assert news["comment_count"] == 1
+    assert news["last_comment_at"] == first["publication_date"]
+    mock_redis.delete.assert_called_with(f"news:{news_id}")
+
+def test_create_comment_news_not_found(sqlite_db):
+    from app.auth.utils import get_current_user
+
+    app.dependency_overrides[get_current_user] = lambda: User(id=1)
+
+    response = client.post("/comments/", json={"news_id": 999, "text": "text"})
+    assert response.status_code == 404
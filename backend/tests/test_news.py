@@ -0,0 +1,193 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+from app.main import app
+from app.database.database import get_async_db
+from app.database.models.user import User
+from app.database.models.news import News
+from app.models.news import NewsResponse
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def dependency_override(override_get_async_db):
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides = {}
+
+@pytest.fixture(autouse=True)
+def mock_redis():
+    with patch("app.handlers.news.async_redis_client", new_callable=AsyncMock) as mock_redis:
+        mock_redis.get_raw.return_value = None
+        yield mock_redis
+
+@pytest.fixture(autouse=True)
+def mock_trending():
+    with patch("app.handlers.news.trending", new_callable=AsyncMock) as trending:
+        yield trending
+
+@pytest.fixture(autouse=True)
+def mock_record_view():
+    with patch("app.handlers.news.record_view", new_callable=AsyncMock) as record_view:
+        yield record_view
+
+# --- Вспомогательная функция: n новостей от n разных авторов ---
+def create_news(db, count):
+    for i in range(count):
+        author = User(name=f"author{i}", email=f"author{i}@test.com")
+        db.add(author)
+        db.flush()
+        db.add(News(title=f"news {i}", content={"text": "text"}, author_id=author.id))
+    db.commit()
+
+# ----------------- TESTS -----------------
+
+@pytest.mark.parametrize("count", [1, 5, 20])
+def test_get_all_news_query_count_is_constant(sqlite_db, query_counter, count):
+    create_news(sqlite_db, count)
+    query_counter.clear()
+
+    response = client.get("/news/", params={"limit": 50})
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == count
+    assert response.json()["items"][0]["author"]["name"].startswith("author")
+    assert len(query_counter) == 1
+
+def test_get_all_news_pagination(sqlite_db):
+    create_news(sqlite_db, 5)
+
+    first = client.get("/news/", params={"limit": 3}).json()
+    second = client.get("/news/", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    ids = [item["id"] for item in first["items"] + second["items"]]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 5
+    assert second["next_cursor"] is None
+
+def test_get_all_news_invalid_cursor():
+    response = client.get("/news/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_get_all_news_from_cache(mock_redis, query_counter):
+    cached_page = b'{"items":[],"next_cursor":null}'
+    mock_redis.get_raw.side_effect = [b"3", cached_page]
+
+    response = client.get("/news/", params={"limit": 10})
+
+    assert response.status_code == 200
+    assert response.content == cached_page
+    assert mock_redis.get_raw.call_args.args[0] == "feed:v3::10::"
+    assert len(query_counter) == 0
+
+def test_get_all_news_caches_page(sqlite_db, mock_redis):
+    create_news(sqlite_db, 2)
+
+    response = client.get("/news/", params={"limit": 10})
+
+    key, payload, _ = mock_redis.set_raw.call_args.args
+    assert key == "feed:v0::10::"
+    assert payload == response.content
+
+def test_get_news_from_cache(mock_redis, query_counter):
+    cached_news = b'{"id":1,"title":"cached"}'
+    mock_redis.get_raw.return_value = cached_news
+
+    response = client.get("/news/1")
+
+    assert response.status_code == 200
+    assert response.content == cached_news
+    assert len(query_counter) == 0
+
+def test_get_news_matches_response_model(sqlite_db, mock_redis):
+    create_news(sqlite_db, 1)
+    news = sqlite_db.query(News).first()
+
+    response = client.get(f"/news/{news.id}")
+
+    assert response.status_code == 200
+    assert response.json() == NewsResponse.model_validate(news).model_dump(mode="json")
+    key, payload, _ = mock_redis.set_raw.call_args.args
+    assert key == f"news:{news.id}"
+    assert payload == response.content
+
+def test_get_news_not_found(mock_redis):
+    response = client.get("/news/999")
+    assert response.status_code == 404
+
+def test_create_news_writes_outbox_event(sqlite_db):
+    from app.auth.dependencies import verified_author_required
+    from app.database.models.outbox import OutboxEvent, NEWS_CREATED_EVENT
+
+    author = User(name="author", email="author@test.com", is_verified=True)
+    sqlite_db.add(author)
+    sqlite_db.commit()
+    app.dependency_overrides[verified_author_required] = lambda: author
+
+    with patch("app.tasks.send_new_news_notification.apply_async") as apply_async:
+        response = client.post("/news/", json={"title": "title", "content": {"text": "text"}})
+
+    assert response.status_code == 201
+    apply_async.assert_not_called()
+    event = sqlite_db.query(OutboxEvent).one()
+    assert event.event_type == NEWS_CREATED_EVENT
+    assert event.payload == {"news_id": response.json()["id"], "news_title": "title", "author_name": "author"}
+
+def test_search_query_uses_search_vector():
+    from sqlalchemy.dialects import postgresql
+    from app.handlers.news import build_search_query
+
+    query = build_search_query("новости спорта", (0.5, 10), 21)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "news.search_vector @@ websearch_to_tsquery" in sql
+    assert "(ts_rank_cd(news.search_vector, websearch_to_tsquery" in sql
+    assert "ORDER BY rank DESC, news.id DESC" in sql
+
+def test_search_news_validation():
+    assert client.get("/news/search", params={"q": "a"}).status_code == 422
+    assert client.get("/news/search", params={"q": "спорт", "cursor": "bad"}).status_code == 400
+
+def test_feed_filters_use_content_index(mock_redis):
+    from sqlalchemy.dialects import postgresql
+    from app.handlers.news import build_feed_query
+
+    query = build_feed_query(None, 21, block_type="image", tag="спорт")
+    compiled = query.compile(dialect=postgresql.dialect())
+
+    assert str(compiled).count("news.content @> CAST(") == 2
+    assert {"blocks": [{"type": "image"}]} in compiled.params.values()
+    assert {"tags": ["спорт"]} in compiled.params.values()
+
+def test_get_all_news_filters_in_cache_key(mock_redis):
+    mock_redis.get_raw.side_effect = [b"1", b'{"items":[],"next_cursor":null}']
+
+    client.get("/news/", params={"limit": 10, "block_type": "image", "tag": "спорт"})
+
+    assert mock_redis.get_raw.call_args.args[0] == "feed:v1::10:image:спорт"
+
+def test_get_news_records_view(sqlite_db, mock_record_view):
+    create_news(sqlite_db, 1)
+
+    client.get("/news/1")
+
+    mock_record_view.assert_awaited_once_with(1)
+
+def test_most_viewed_keeps_redis_order(sqlite_db):
+    create_news(sqlite_db, 2)
+
+    with patch("app.handlers.news.get_most_viewed", new_callable=AsyncMock) as get_most_viewed:
+        get_most_viewed.return_value = [(2, 10), (999, 5), (1, 3)]
+        response = client.get("/news/most-viewed", params={"hours": 6, "limit": 3})
+
+    get_most_viewed.assert_awaited_once_with(6, 3)
+    assert [(item["id"], item["recent_views"]) for item in response.json()] == [(2, 10), (1, 3)]
+
+def test_trending_is_served_from_redis(mock_trending, query_counter):
+    mock_trending.get_trending.return_value = b'[{"id":1}]'
+
+    response = client.get("/news/trending", params={"limit": 5})
+
+    assert response.content == b'[{"id":1}]'
+    mock_trending.get_trending.assert_awaited_once_with(5)
+    assert len(query_counter) == 0
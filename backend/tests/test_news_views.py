@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from app.database.models.user import User
+from app.database.models.news import News
+from app import news_views
+
+
+# --- Вспомогательная функция: Redis с накопленными приращениями ---
+def make_redis(deltas, flushing=False):
+    redis = MagicMock()
+    redis.set.return_value = True
+    redis.exists.side_effect = lambda key: key == news_views.VIEWS_PENDING_KEY or flushing
+    redis.get.return_value = "flush-1"
+    redis.hgetall.return_value = deltas
+    return redis
+
+def add_news(db, count):
+    db.add(User(name="author", email="author@test.com"))
+    for i in range(count):
+        db.add(News(title=f"news{i}", content={}, author_id=1, views=10))
+    db.commit()
+
+# ----------------- TESTS -----------------
+
+def test_flush_views_applies_deltas_in_batches(sqlite_db):
+    add_news(sqlite_db, 3)
+    redis = make_redis({"1": "3", "3": "5"})
+
+    with patch.object(news_views.redis_client, "client", redis), \
+         patch.object(news_views.settings, "news_views_flush_batch_size", 1):
+        assert news_views.flush_views(sqlite_db) == 2
+
+    sqlite_db.expire_all()
+    assert [news.views for news in sqlite_db.query(News).order_by(News.id)] == [13, 10, 15]
+    redis.pipeline.return_value.__enter__.return_value.rename.assert_called_once_with(
+        news_views.VIEWS_PENDING_KEY, news_views.VIEWS_FLUSHING_KEY
+    )
+    # Каждая пачка убирается из хэша сразу после своего коммита
+    assert redis.hdel.call_count == 2
+    # Блокировка снимается сравнением со своим токеном
+    lock_token = redis.set.call_args_list[0].args[1]
+    redis.eval.assert_called_once_with(
+        news_views.RELEASE_LOCK_SCRIPT, 1, news_views.VIEWS_FLUSH_LOCK_KEY, lock_token
+    )
+
+def test_flush_views_does_not_reapply_committed_batch(sqlite_db):
+    add_news(sqlite_db, 2)
+    # Падение после коммита, но до HDEL: хэш остаётся целиком
+    crashed = make_redis({"1": "3", "2": "4"})
+    crashed.hdel.side_effect = ConnectionError
+    retried = make_redis({"1": "3", "2": "4"}, flushing=True)
+
+    with patch.object(news_views.redis_client, "client", crashed), pytest.raises(ConnectionError):
+        news_views.flush_views(sqlite_db)
+    with patch.object(news_views.redis_client, "client", retried):
+        assert news_views.flush_views(sqlite_db) == 2
+
+    sqlite_db.expire_all()
+    assert [news.views for news in sqlite_db.query(News).order_by(News.id)] == [13, 14]
+    crashed.eval.assert_called_once()
+    retried.rename.assert_not_called()
+    retried.hdel.assert_called_once()
+
+def test_flush_views_skips_when_locked(sqlite_db):
+    redis = make_redis({})
+    redis.set.return_value = None
+
+    with patch.object(news_views.redis_client, "client", redis):
+        assert news_views.flush_views(sqlite_db) == 0
+
+    redis.rename.assert_not_called()
@@ -0,0 +1,44 @@
+import gzip
+import orjson
+from app.notification_log import NotificationLogWriter
+
+
+# --- Вспомогательная функция: writer в tmp-папке ---
+def make_writer(tmp_path, **kwargs):
+    options = {"buffer_bytes": 1024, "flush_interval": 60, "max_bytes": 10 * 1024, "compress": True}
+    options.update(kwargs)
+    return NotificationLogWriter(tmp_path, **options)
+
+# ----------------- TESTS -----------------
+
+def test_records_are_buffered_until_flush(tmp_path):
+    writer = make_writer(tmp_path)
+
+    writer.write({"type": "new_news", "recipients": ["a@test.com", "b@test.com"]})
+    assert not writer.get_path().exists()
+
+    writer.close()
+    lines = writer.get_path().read_bytes().splitlines()
+    assert [orjson.loads(line)["recipients"] for line in lines] == [["a@test.com", "b@test.com"]]
+
+def test_full_buffer_is_flushed(tmp_path):
+    writer = make_writer(tmp_path, buffer_bytes=100)
+
+    writer.write({"recipients": ["user@test.com"] * 10})
+
+    assert writer.get_path().exists()
+    writer.close()
+
+def test_rotation_compresses_full_files(tmp_path):
+    writer = make_writer(tmp_path, buffer_bytes=1, max_bytes=500)
+    record = {"recipients": ["user@test.com"] * 40}
+
+    for _ in range(3):
+        writer.write(record)
+    writer.close()
+
+    rotated = sorted(tmp_path.glob("*.gz"))
+    assert len(rotated) == 3
+    with gzip.open(rotated[0]) as f:
+        assert orjson.loads(f.read()) == record
+    assert not writer.get_path().exists()
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+from app.database.redis_client import LocalCache, _MISSING
+
+
+# ----------------- TESTS -----------------
+
+def test_local_cache_ignores_unknown_namespace():
+    cache = LocalCache(limits={"user:": 2}, ttl=30)
+    cache.set("session:abc", {"user_id": 1})
+
+    assert not cache.accepts("session:abc")
+    assert cache.stats()["size"] == {"user:": 0}
+
+def test_local_cache_evicts_least_recently_used_per_namespace():
+    cache = LocalCache(limits={"user:": 2, "news:": 2}, ttl=30)
+    cache.set("user:1", 1)
+    cache.set("user:2", 2)
+    cache.set("news:1", 1)
+    cache.get("user:1")
+    cache.set("user:3", 3)
+
+    assert cache.get("user:2") is _MISSING
+    assert cache.get("user:1") == 1
+    assert cache.get("user:3") == 3
+    assert cache.get("news:1") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_local_cache_respects_ttl():
+    cache = LocalCache(limits={"user:": 10}, ttl=30)
+    with patch("app.database.redis_client.time.monotonic", return_value=100.0):
+        cache.set("user:1", 1, ttl=5)
+    with patch("app.database.redis_client.time.monotonic", return_value=104.0):
+        assert cache.get("user:1") == 1
+    with patch("app.database.redis_client.time.monotonic", return_value=106.0):
+        assert cache.get("user:1") is _MISSING
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_local_cache_skips_value_read_before_invalidation():
+    cache = LocalCache(limits={"user:": 10}, ttl=30)
+    generation = cache.generation
+    cache.delete("user:1")
+    cache.set("user:1", "stale", generation=generation)
+
+    assert cache.get("user:1") is _MISSING
+
+def test_mget_decodes_json_and_missing_keys():
+    from app.database.redis_client import RedisClient
+    redis = RedisClient()
+    with patch.object(redis, "client") as client:
+        client.mget.return_value = ['{"id": 1}', None]
+        assert redis.mget(["user:1", "user:2"]) == [{"id": 1}, None]
+        client.mget.assert_called_once_with(["user:1", "user:2"])
+        assert redis.mget([]) == []
+
+def test_get_and_delete_uses_single_pipeline():
+    from app.database.redis_client import RedisClient
+    redis = RedisClient()
+    with patch.object(redis, "client") as client:
+        pipe = client.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = ['{"user_id": 1}']
+        assert redis.get_and_delete("session:abc") == {"user_id": 1}
+        pipe.getdel.assert_called_once_with("session:abc")
+        client.get.assert_not_called()
+
+def test_mset_with_ttl_invalidates_local_copies():
+    from app.database.redis_client import RedisClient
+    redis = RedisClient()
+    redis.local.set("user:1", "stale")
+    with patch.object(redis, "client") as client, patch.object(redis, "_ensure_subscriber", return_value=True):
+        pipe = client.pipeline.return_value.__enter__.return_value
+        redis.mset_with_ttl({"user:1": {"id": 1}, "other:1": 2}, ttl=60)
+    assert pipe.setex.call_count == 2
+    pipe.setex.assert_any_call("user:1", 60, '{"id": 1}')
+    pipe.publish.assert_called_once()
+    assert redis.local.get("user:1") is _MISSING
+
+def test_feed_pages_use_own_namespace_without_invalidation():
+    from app.database.redis_client import RedisClient
+    redis = RedisClient()
+    redis._subscriber = object()
+    with patch.object(redis, "binary_client") as client:
+        pipe = client.pipeline.return_value.__enter__.return_value
+        redis.set_raw("feed:v1::10::", b"[]", 60, invalidate=False)
+    pipe.publish.assert_not_called()
+    assert redis.local.get("feed:v1::10::") == b"[]"
+    assert redis.local.stats()["size"]["news:"] == 0
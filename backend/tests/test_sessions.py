@@ -0,0 +1,213 @@
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import select
+from app.main import app
+from app.database.database import get_async_db
+from app.database.models.user import User
+from app.database.models.refresh_token import RefreshToken
+from app.auth.sessions import hash_refresh_token
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def dependency_override(override_get_async_db):
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides = {}
+
+@pytest.fixture(autouse=True)
+def mock_redis():
+    with patch("app.auth.sessions.async_redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("app.auth.utils.async_redis_client", new_callable=AsyncMock) as mock_utils_redis, \
+         patch("app.handlers.auth.verify_password", return_value=True):
+        # По умолчанию кэш пуст: сессии читаются из БД
+        mock_redis.client.hgetall.return_value = {}
+        mock_redis.client.hget.return_value = None
+        mock_utils_redis.get.return_value = None
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[0, 0])
+        mock_redis.pipeline = MagicMock()
+        mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+        yield mock_redis
+
+@pytest.fixture
+def user(sqlite_db):
+    user = User(name="author", email="author@test.com", hashed_password="hashed", is_verified=True)
+    sqlite_db.add(user)
+    sqlite_db.commit()
+    return user
+
+# --- Вспомогательная функция: вход и пара токенов ---
+def login():
+    response = client.post("/auth/login", data={"username": "author@test.com", "password": "P!"})
+    assert response.status_code == 200
+    return response.json()
+
+def refresh(refresh_token):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+# ----------------- TESTS -----------------
+
+def test_refresh_token_is_stored_hashed(sqlite_db, user):
+    refresh_token = login()["refresh_token"]
+
+    row = sqlite_db.execute(select(RefreshToken)).scalar_one()
+    assert row.token_hash == hash_refresh_token(refresh_token)
+    assert row.user_id == user.id
+    assert refresh_token not in (row.token_hash, row.family_id)
+
+def test_refresh_rotates_token(sqlite_db, user):
+    first = login()["refresh_token"]
+
+    response = refresh(first)
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+    assert second != first
+    assert refresh(second).status_code == 200
+
+    rows = sqlite_db.execute(select(RefreshToken).order_by(RefreshToken.id)).scalars().all()
+    assert len(rows) == 3
+    assert len({row.family_id for row in rows}) == 1
+    assert rows[0].rotated_at is not None and rows[1].rotated_at is not None
+    assert rows[2].rotated_at is None
+
+def test_reused_refresh_token_revokes_family(sqlite_db, user):
+    first = login()["refresh_token"]
+    other_device = login()["refresh_token"]
+    second = refresh(first).json()["refresh_token"]
+
+    # Старый токен предъявлен повторно — отзывается вся цепочка, включая свежий
+    assert refresh(first).status_code == 401
+    assert refresh(second).status_code == 401
+    # Другие входы пользователя не затронуты
+    assert refresh(other_device).status_code == 200
+
+def test_refresh_uses_cached_session(sqlite_db, user, mock_redis, query_counter):
+    first = login()["refresh_token"]
+    row = sqlite_db.execute(select(RefreshToken)).scalar_one()
+    mock_redis.client.hgetall.return_value = {
+        "user_id": str(user.id), "family_id": row.family_id, "user_agent": "ua", "created_at": "",
+    }
+    query_counter.clear()
+
+    assert refresh(first).status_code == 200
+    assert not any(s.lstrip().upper().startswith("SELECT") and "refresh_tokens" in s for s in query_counter)
+    mock_redis.client.hgetall.assert_awaited_with(f"session:{hash_refresh_token(first)}")
+
+def test_logout_revokes_session(sqlite_db, user):
+    refresh_token = login()["refresh_token"]
+
+    assert client.post("/auth/logout", json={"refresh_token": refresh_token}).status_code == 200
+    assert client.post("/auth/logout", json={"refresh_token": refresh_token}).status_code == 404
+    assert client.post("/auth/logout", json={"refresh_token": "garbage"}).status_code == 404
+    assert refresh(refresh_token).status_code == 401
+
+def test_sessions_are_listed_from_db(sqlite_db, user):
+    access_token = login()["access_token"]
+    login()
+    logged_out = login()["refresh_token"]
+    client.post("/auth/logout", json={"refresh_token": logged_out})
+
+    response = client.get("/auth/sessions", headers={"Authorization": f"Bearer {access_token}"})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+def test_legacy_redis_session_is_adopted(sqlite_db, user, mock_redis):
+    from app.auth.utils import create_refresh_token
+    legacy_token = create_refresh_token(user.id)
+    mock_redis.client.hget.return_value = str(user.id)
+
+    response = refresh(legacy_token)
+
+    assert response.status_code == 200
+    row = sqlite_db.execute(select(RefreshToken)).scalar_one()
+    assert row.token_hash == hash_refresh_token(response.json()["refresh_token"])
+    mock_redis.client.hget.assert_awaited_once_with(f"session:{legacy_token}", "user_id")
+
+# --- Вспомогательная функция: n сессий пользователя напрямую в БД ---
+def create_sessions(db, user_id, count):
+    expires_at = datetime.utcnow() + timedelta(days=1)
+    for i in range(count):
+        db.add(RefreshToken(user_id=user_id, token_hash=f"{user_id}-{i}", family_id=f"{user_id}-{i}", expires_at=expires_at))
+    db.commit()
+
+def test_logout_all_revokes_sessions_and_access_tokens(sqlite_db, user):
+    tokens = login()
+    other = login()
+    auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = client.post("/auth/logout-all", headers=auth)
+
+    assert response.status_code == 200
+    assert response.json()["revoked_sessions"] == 2
+    assert refresh(tokens["refresh_token"]).status_code == 401
+    assert refresh(other["refresh_token"]).status_code == 401
+    # Версия токенов выросла — старый access-токен больше не принимается
+    response = client.get("/auth/sessions", headers=auth)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+
+def test_refresh_token_is_not_accepted_as_bearer(sqlite_db, user):
+    tokens = login()
+
+    response = client.get("/auth/sessions", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid token type"
+    # И наоборот: access-токен не обменивается на новую пару
+    assert refresh(tokens["access_token"]).status_code == 401
+
+@patch("app.handlers.user.invalidate_news_feed", new_callable=AsyncMock)
+@patch("app.handlers.user.verify_password", new_callable=AsyncMock, return_value=True)
+def test_profile_update_revokes_tokens_only_when_claims_change(verify_password, invalidate_news_feed, sqlite_db, user):
+    auth = {"Authorization": f"Bearer {login()['access_token']}"}
+    profile = {"name": "author", "email": "new@test.com", "is_verified": True, "password": "StrongPassword1!"}
+
+    # Почта и аватар в токене не зашиты — токен продолжает работать
+    response = client.put(f"/users/{user.id}", json={**profile, "avatar": "avatar.png"}, headers=auth)
+    assert response.status_code == 200
+    assert client.get("/auth/sessions", headers=auth).status_code == 200
+
+    response = client.put(f"/users/{user.id}", json={**profile, "name": "renamed"}, headers=auth)
+    assert response.status_code == 200
+    assert client.get("/auth/sessions", headers=auth).json()["detail"] == "Token revoked"
+
+@pytest.mark.parametrize("other_sessions", [0, 200])
+def test_bulk_revoke_touches_only_affected_sessions(sqlite_db, user, mock_redis, other_sessions):
+    from app.auth.utils import create_user_access_token
+    admin = User(name="admin", email="admin@test.com", is_admin=True, is_verified=True)
+    bystander = User(name="bystander", email="bystander@test.com")
+    sqlite_db.add_all([admin, bystander])
+    sqlite_db.commit()
+    create_sessions(sqlite_db, user.id, 3)
+    create_sessions(sqlite_db, bystander.id, other_sessions)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    pipe.reset_mock()
+
+    response = client.post(
+        "/auth/revoke-sessions",
+        json={"user_ids": [user.id, user.id, 999]},
+        headers={"Authorization": f"Bearer {create_user_access_token(admin)}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"users": 1, "revoked_sessions": 3}
+    deleted = [key for call in pipe.delete.call_args_list for key in call.args]
+    assert sorted(deleted) == [f"session:{user.id}-{i}" for i in range(3)]
+    active = sqlite_db.execute(
+        select(RefreshToken.user_id).where(RefreshToken.revoked_at.is_(None))
+    ).scalars().all()
+    assert active == [bystander.id] * other_sessions
+
+def test_bulk_revoke_requires_admin(sqlite_db, user):
+    access_token = login()["access_token"]
+
+    response = client.post(
+        "/auth/revoke-sessions",
+        json={"user_ids": [user.id]},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+    assert response.status_code == 403
@@ -0,0 +1,169 @@
+import hashlib
+import json
+from unittest.mock import patch
+from app.database.models.user import User
+from app import tasks
+
+
+# --- Вспомогательная функция: n пользователей ---
+def create_users(db, count):
+    for i in range(count):
+        db.add(User(name=f"user{i}", email=f"user{i}@test.com"))
+    db.commit()
+
+# ----------------- TESTS -----------------
+
+def test_iter_recipient_batches(sqlite_db):
+    create_users(sqlite_db, 5)
+
+    batches = list(tasks.iter_recipient_batches(sqlite_db, 2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0] == ["user0@test.com", "user1@test.com"]
+
+def test_new_news_notification_fans_out_batches(sqlite_db):
+    create_users(sqlite_db, 5)
+
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db), \
+         patch.object(tasks, "redis_client"), \
+         patch.object(tasks.settings, "notification_batch_size", 2), \
+         patch.object(tasks.send_notification_batch, "apply_async") as apply_async:
+        tasks.send_new_news_notification.run(news_id=1, news_title="title", author_name="author")
+
+    sent = [call.kwargs["kwargs"]["recipients"] for call in apply_async.call_args_list]
+    assert sum(sent, []) == [f"user{i}@test.com" for i in range(5)]
+    content_keys = {call.kwargs["kwargs"]["content_key"] for call in apply_async.call_args_list}
+    assert len(content_keys) == 1
+
+def test_weekly_digest_uses_single_query(sqlite_db, query_counter):
+    from app.database.models.news import News
+
+    create_users(sqlite_db, 3)
+    for i in range(5):
+        sqlite_db.add(News(title=f"news{i}", content={}, author_id=i % 3 + 1))
+    sqlite_db.commit()
+    query_counter.clear()
+
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db), \
+         patch.object(tasks, "redis_client") as redis_mock, \
+         patch.object(tasks.send_notification_batch, "apply_async") as apply_async:
+        tasks.send_weekly_digest.run()
+
+    # Один запрос на дайджест и один — на получателей
+    assert len(query_counter) == 2
+    assert apply_async.call_count == 1
+    stored = redis_mock.client.set.call_args.args[1]
+    assert "news4 (автор: user1" in stored
+
+def test_task_id_is_stable_digest():
+    kwargs = {"news_id": 1, "news_title": "title", "author_name": "author"}
+
+    with patch("celery.app.task.Task.apply_async") as apply_async:
+        tasks.send_new_news_notification.apply_async(kwargs=kwargs)
+        tasks.send_new_news_notification.apply_async(kwargs=dict(reversed(kwargs.items())))
+
+    first, second = (call.kwargs["task_id"] for call in apply_async.call_args_list)
+    assert first == second
+    # Не зависит от PYTHONHASHSEED процесса
+    digest = hashlib.sha256(json.dumps(kwargs, sort_keys=True).encode()).hexdigest()
+    assert first == f"{tasks.send_new_news_notification.name}:{digest}"
+
+def test_duplicate_task_is_skipped():
+    task = tasks.send_notification_batch
+    kwargs = {"notification_type": "new_news", "recipients": ["a@test.com"], "content_key": "key"}
+
+    with patch.object(tasks, "redis_client") as redis_mock, \
+         patch.object(tasks, "log_notification") as log_notification, \
+         patch.object(tasks, "load_notification_content", return_value={}):
+        redis_mock.client.set.side_effect = [True, None]
+        for _ in range(2):
+            task.push_request(id="send_notification_batch:digest", retries=0, delivery_info={})
+            try:
+                task(**kwargs)
+            finally:
+                task.pop_request()
+
+    assert log_notification.call_count == 1
+
+def test_relay_outbox_events(sqlite_db):
+    from app.database.models.outbox import OutboxEvent, NEWS_CREATED_EVENT
+
+    for i in range(5):
+        sqlite_db.add(OutboxEvent(
+            event_type=NEWS_CREATED_EVENT,
+            payload={"news_id": i, "news_title": f"news{i}", "author_name": "author"},
+        ))
+    sqlite_db.commit()
+
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db), \
+         patch.object(tasks.settings, "outbox_batch_size", 2), \
+         patch.object(tasks.send_new_news_notification, "apply_async") as apply_async:
+        relayed = tasks.relay_outbox_events()
+
+    assert relayed == 5
+    assert [call.kwargs["kwargs"]["news_id"] for call in apply_async.call_args_list] == list(range(5))
+    assert sqlite_db.query(OutboxEvent).count() == 0
+
+def test_relay_outbox_events_keeps_unknown_events(sqlite_db):
+    from app.database.models.outbox import OutboxEvent, NEWS_CREATED_EVENT
+
+    sqlite_db.add(OutboxEvent(event_type="unknown", payload={}))
+    sqlite_db.add(OutboxEvent(
+        event_type=NEWS_CREATED_EVENT,
+        payload={"news_id": 1, "news_title": "news", "author_name": "author"},
+    ))
+    sqlite_db.commit()
+
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db), \
+         patch.object(tasks.send_new_news_notification, "apply_async") as apply_async:
+        assert tasks.relay_outbox_events() == 1
+        # Помеченное событие не выбирается повторно
+        assert tasks.relay_outbox_events() == 0
+
+    assert apply_async.call_count == 1
+    sqlite_db.expire_all()
+    (event,) = sqlite_db.query(OutboxEvent).all()
+    assert event.event_type == "unknown"
+    assert event.failed_at is not None
+
+def test_backfill_comment_stats(sqlite_db):
+    from app.database.models.news import News
+    from app.database.models.comment import Comment
+
+    create_users(sqlite_db, 1)
+    for i in range(3):
+        sqlite_db.add(News(title=f"news{i}", content={}, author_id=1))
+    sqlite_db.flush()
+    for news_id in (1, 1, 3):
+        sqlite_db.add(Comment(text="text", news_id=news_id, author_id=1))
+    sqlite_db.commit()
+
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db):
+        assert tasks.backfill_comment_stats(batch_size=2) == 3
+
+    sqlite_db.expire_all()
+    counts = [news.comment_count for news in sqlite_db.query(News).order_by(News.id)]
+    assert counts == [2, 0, 1]
+    assert sqlite_db.get(News, 2).last_comment_at is None
+    assert sqlite_db.get(News, 3).last_comment_at is not None
+
+def test_purge_refresh_tokens_in_batches(sqlite_db, query_counter):
+    from datetime import datetime, timedelta
+    from app.database.models.refresh_token import RefreshToken
+    create_users(sqlite_db, 1)
+    user_id = sqlite_db.query(User.id).scalar()
+    now = datetime.utcnow()
+    for i in range(5):
+        sqlite_db.add(RefreshToken(
+            user_id=user_id, token_hash=f"expired{i}", family_id="f", expires_at=now - timedelta(days=1),
+        ))
+    sqlite_db.add(RefreshToken(user_id=user_id, token_hash="active", family_id="f", expires_at=now + timedelta(days=1)))
+    sqlite_db.commit()
+
+    query_counter.clear()
+    with patch.object(tasks, "SessionLocal", return_value=sqlite_db):
+        purged = tasks.purge_refresh_tokens(batch_size=2)
+
+    assert purged == 5
+    assert [token for token, in sqlite_db.query(RefreshToken.token_hash)] == ["active"]
+    assert sum(statement.startswith("DELETE") for statement in query_counter) == 3
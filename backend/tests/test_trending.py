@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+from app.database.models.user import User
+from app.database.models.news import News
+from app.database.models.comment import Comment
+from app import trending
+
+
+# --- Вспомогательная функция: Redis, в котором просмотры есть только за текущий час ---
+def make_redis(views):
+    redis = MagicMock()
+    pipe = redis.pipeline.return_value.__enter__.return_value
+    current_hour = trending.datetime.utcnow().strftime("%Y%m%d%H")
+    redis.zrange.side_effect = lambda key, *args, **kwargs: views if key.endswith(current_hour) else []
+    return redis, pipe
+
+# ----------------- TESTS -----------------
+
+def test_rebuild_trending_combines_recency_comments_and_views(sqlite_db):
+    now = datetime.utcnow()
+    sqlite_db.add(User(name="author", email="author@test.com"))
+    sqlite_db.add_all([
+        News(title="fresh", content={}, author_id=1, publication_date=now),
+        News(title="old but discussed", content={}, author_id=1, publication_date=now - timedelta(days=2)),
+        News(title="old but viewed", content={}, author_id=1, publication_date=now - timedelta(days=2)),
+        News(title="out of window", content={}, author_id=1, publication_date=now - timedelta(days=30)),
+    ])
+    sqlite_db.flush()
+    for _ in range(10):
+        sqlite_db.add(Comment(text="text", news_id=2, author_id=1, publication_date=now))
+    sqlite_db.commit()
+    redis, pipe = make_redis([(b"3", 20.0), (b"4", 1000.0)])
+
+    with patch.object(trending.redis_client, "binary_client", redis):
+        assert trending.rebuild_trending(sqlite_db) == 3
+
+    scores = pipe.zadd.call_args.args[1]
+    assert sorted(scores, key=scores.get, reverse=True) == [2, 3, 1]
+    assert set(pipe.hset.call_args.kwargs["mapping"]) == {1, 2, 3}
+    pipe.rename.assert_any_call(trending.TRENDING_KEY + ":next", trending.TRENDING_KEY)
+    assert pipe.set.call_args.args[0] == trending.TRENDING_EPOCH_KEY
+
+def test_get_trending_joins_cached_payloads():
+    client = AsyncMock()
+    client.zrevrange.return_value = [b"2", b"1", b"9"]
+    client.hmget.return_value = [b'{"id":2}', b'{"id":1}', None]
+
+    with patch.object(trending.async_redis_client, "binary_client", client):
+        assert asyncio.run(trending.get_trending(3)) == b'[{"id":2},{"id":1}]'
+
+def test_queue_bump_only_creates_members_from_add_news():
+    pipe = MagicMock()
+    trending.queue_bump(pipe, 5, 1.0, now=100.0)
+    trending.queue_bump(pipe, 5, 1.0, now=100.0, create=True)
+
+    (view, created) = [call.args for call in pipe.evalsha.call_args_list]
+    assert view[0] == created[0] == trending.BUMP_SHA
+    assert (view[-1], created[-1]) == (0, 1)
+    assert "ZSCORE" in trending.BUMP_SCRIPT
+
+def test_execute_with_bumps_reloads_script_and_retries_only_bumps():
+    client = AsyncMock()
+    client.execute_command.return_value = 3.0
+    pipe = MagicMock()
+    pipe.command_stack = [(("HINCRBY", "views:pending", 5, 1), {})]
+    trending.queue_bump(pipe, 5, 1.0, now=100.0)
+    pipe.command_stack.append((("EVALSHA",) + pipe.evalsha.call_args.args, {}))
+    pipe.execute = AsyncMock(return_value=[1, trending.NoScriptError("NOSCRIPT")])
+
+    assert asyncio.run(trending.execute_with_bumps(pipe, client)) == [1, 3.0]
+    client.script_load.assert_awaited_once_with(trending.BUMP_SCRIPT)
+    client.execute_command.assert_awaited_once_with("EVALSHA", *pipe.evalsha.call_args.args)
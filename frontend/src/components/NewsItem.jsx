@@ -19,6 +19,7 @@ const NewsItem = ({ news }) => {
             <div className={styles.meta}>
                 <span>✍️ {authorName}</span>
                 <span>📅 {new Date(news.publication_date).toLocaleDateString()}</span>
+                <span>💬 {news.comment_count ?? 0}</span>
             </div>
             <p className={styles.preview}>
                 {previewText.substring(0, 150)}...
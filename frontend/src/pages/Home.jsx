@@ -7,11 +7,13 @@ const Home = () => {
     const [news, setNews] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
 
-    useEffect(() => {
-        axiosClient.get('/news/')
+    const loadPage = (cursor = null) => {
+        axiosClient.get('/news/', { params: cursor ? { cursor } : {} })
             .then(res => {
-                setNews(res.data);
+                setNews(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+                setNextCursor(res.data.next_cursor);
                 setError(null);
             })
             .catch(err => {
@@ -19,7 +21,9 @@ const Home = () => {
                 setError('Не удалось загрузить новости.');
             })
             .finally(() => setLoading(false));
-    }, []);
+    };
+
+    useEffect(() => { loadPage(); }, []);
 
     if (loading) return <div className={styles.container}>🚀 Загрузка...</div>;
     if (error) return <div className={styles.container} style={{color: 'red'}}>❌ {error}</div>;
@@ -36,6 +40,9 @@ const Home = () => {
                     ))}
                 </div>
             )}
+            {nextCursor && (
+                <button onClick={() => loadPage(nextCursor)}>Показать ещё</button>
+            )}
         </div>
     );
 };
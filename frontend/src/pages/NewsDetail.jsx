@@ -11,6 +11,7 @@ const NewsDetail = () => {
     
     const [news, setNews] = useState(null);
     const [comments, setComments] = useState([]);
+    const [commentsCursor, setCommentsCursor] = useState(null);
     const [newComment, setNewComment] = useState('');
     
     // Состояние для редактирования комментария (храним ID коммента и текст)
@@ -22,8 +23,19 @@ const NewsDetail = () => {
             const newsRes = await axiosClient.get(`/news/${id}`);
             setNews(newsRes.data);
             
-            const commentsRes = await axiosClient.get(`/comments/?news_id=${id}`);
-            setComments(commentsRes.data || []);
+            const commentsRes = await axiosClient.get(`/news/${id}/comments`);
+            setComments(commentsRes.data.items);
+            setCommentsCursor(commentsRes.data.next_cursor);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
+    const loadMoreComments = async () => {
+        try {
+            const res = await axiosClient.get(`/news/${id}/comments`, { params: { cursor: commentsCursor } });
+            setComments(prev => [...prev, ...res.data.items]);
+            setCommentsCursor(res.data.next_cursor);
         } catch (err) {
             console.error(err);
         }
@@ -167,6 +179,9 @@ const NewsDetail = () => {
                         );
                     })}
                 </div>
+                {commentsCursor && (
+                    <button onClick={loadMoreComments}>Показать ещё</button>
+                )}
             </section>
         </div>
     );